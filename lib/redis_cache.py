@@ -8,16 +8,25 @@ from typing import Dict, Optional
 from datetime import datetime, timedelta
 
 class ClimateCache:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    def __init__(self, redis_url: str = "redis://localhost:6379", codec=None):
         """
         Initialize Redis cache connection.
         
         Args:
             redis_url: Redis connection URL
+            codec: Optional value codec with encode(dict) -> bytes and
+                decode(bytes) -> dict (e.g. wire_format.RecordCodec, which
+                round-trips every field and still reads plain JSON values);
+                webcam values are stored as JSON when omitted
         """
-        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        self.codec = codec
+        # Binary codecs need raw bytes back from Redis
+        self.redis_client = redis.from_url(redis_url, decode_responses=codec is None)
         self.cache_ttl = 300  # 5 minutes
     
+    def _decode_str(self, value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+    
     def set_webcam_data(self, webcam_id: str, data: Dict) -> bool:
         """
         Store webcam analysis data in cache.
@@ -31,7 +40,7 @@ class ClimateCache:
         """
         try:
             key = f"webcam:{webcam_id}"
-            value = json.dumps(data)
+            value = self.codec.encode(data) if self.codec else json.dumps(data)
             self.redis_client.setex(key, self.cache_ttl, value)
             print(f"[v0] Cached data for {webcam_id}")
             return True
@@ -39,6 +48,30 @@ class ClimateCache:
             print(f"[v0] Error caching data: {str(e)}")
             return False
     
+    def set_many_webcam_data(self, items: Dict[str, Dict]) -> int:
+        """
+        Store analysis data for many webcams in one round trip.
+        
+        Args:
+            items: Mapping of webcam ID to analysis data
+            
+        Returns:
+            Number of value bytes written (0 on failure)
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            written = 0
+            for webcam_id, data in items.items():
+                value = self.codec.encode(data) if self.codec else json.dumps(data)
+                written += len(value)
+                pipe.setex(f"webcam:{webcam_id}", self.cache_ttl, value)
+            pipe.execute()
+            print(f"[v0] Cached data for {len(items)} webcams")
+            return written
+        except Exception as e:
+            print(f"[v0] Error caching data: {str(e)}")
+            return 0
+    
     def get_webcam_data(self, webcam_id: str) -> Optional[Dict]:
         """
         Retrieve webcam data from cache.
@@ -53,7 +86,7 @@ class ClimateCache:
             key = f"webcam:{webcam_id}"
             value = self.redis_client.get(key)
             if value:
-                return json.loads(value)
+                return self.codec.decode(value) if self.codec else json.loads(value)
             return None
         except Exception as e:
             print(f"[v0] Error retrieving cache: {str(e)}")
@@ -70,7 +103,7 @@ class ClimateCache:
             keys = self.redis_client.keys("webcam:*")
             result = {}
             for key in keys:
-                webcam_id = key.split(":")[1]
+                webcam_id = self._decode_str(key).split(":")[1]
                 data = self.get_webcam_data(webcam_id)
                 if data:
                     result[webcam_id] = data
@@ -79,20 +112,31 @@ class ClimateCache:
             print(f"[v0] Error retrieving all webcams: {str(e)}")
             return {}
     
-    def set_city_stats(self, stats: Dict) -> bool:
+    def set_city_stats(self, stats: Dict, districts: Optional[Dict[str, Dict]] = None) -> bool:
         """
         Store city-wide statistics.
         
+        City and district stats are written in one MULTI/EXEC transaction so
+        readers never see a city total that disagrees with its districts.
+        
         Args:
             stats: Statistics dictionary
+            districts: Optional mapping of district name to its statistics
             
         Returns:
             True if successful
         """
         try:
-            key = "city:stats"
-            value = json.dumps(stats)
-            self.redis_client.setex(key, self.cache_ttl, value)
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.setex("city:stats", self.cache_ttl, json.dumps(stats))
+            if districts is not None:
+                pipe.delete("city:districts")
+                if districts:
+                    pipe.hset("city:districts", mapping={
+                        name: json.dumps(value) for name, value in districts.items()
+                    })
+                    pipe.expire("city:districts", self.cache_ttl)
+            pipe.execute()
             return True
         except Exception as e:
             print(f"[v0] Error caching stats: {str(e)}")
@@ -113,6 +157,20 @@ class ClimateCache:
         except Exception as e:
             print(f"[v0] Error retrieving stats: {str(e)}")
             return None
+    
+    def get_district_stats(self) -> Dict[str, Dict]:
+        """
+        Retrieve per-district statistics.
+        
+        Returns:
+            Dictionary mapping district names to their statistics
+        """
+        try:
+            values = self.redis_client.hgetall("city:districts")
+            return {self._decode_str(name): json.loads(value) for name, value in values.items()}
+        except Exception as e:
+            print(f"[v0] Error retrieving district stats: {str(e)}")
+            return {}
 
 if __name__ == "__main__":
     # Test Redis cache
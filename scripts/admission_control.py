@@ -0,0 +1,296 @@
+"""
+Admission Control for the Analysis Queue
+Prioritizes which camera frames get analyzed when there is more work than
+time: cameras inside the configured viewport (a fixed map area, e.g. from
+the pipeline's --viewport flag) and cameras whose readings are changing
+quickly go first. Under overload the controller degrades
+gracefully - it drops superseded and stale frames, skips advanced wetness,
+lowers analysis resolution and finally sheds low-priority cameras - and
+tracks queue-latency SLOs.
+"""
+
+import heapq
+import itertools
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Degradation levels, from normal operation to heaviest load shedding
+LEVEL_NORMAL = 0
+LEVEL_SKIP_ADVANCED = 1
+LEVEL_REDUCED_RESOLUTION = 2
+LEVEL_SHED = 3
+LEVEL_NAMES = ("normal", "skip_advanced", "reduced_resolution", "shed")
+
+# Relative analysis cost at each level, used to estimate the queue drain time
+LEVEL_COST = (1.0, 0.6, 0.3, 0.3)
+
+
+class AnalysisTask:
+    """A fetched frame waiting for analysis."""
+
+    __slots__ = ("camera_id", "image_path", "location", "enqueued_at", "payload")
+
+    def __init__(self, camera_id: str, image_path: str, location: Optional[Dict] = None,
+                 enqueued_at: float = 0.0, payload: Optional[Dict] = None):
+        self.camera_id = camera_id
+        self.image_path = image_path
+        self.location = location
+        self.enqueued_at = enqueued_at
+        self.payload = payload or {}
+
+
+class AdmissionController:
+    """
+    Priority queue with one pending frame per camera.
+
+    Priority = viewport boost + recent volatility (an EWMA of how much the
+    camera's sun/wetness changed between analyses); ties go to the oldest
+    frame. A new frame for a camera replaces the queued one; frames older
+    than `max_frame_age` are dropped at dispatch.
+
+    The degradation level is picked from the estimated time to drain the
+    queue at full quality versus the latency SLO.
+    """
+
+    def __init__(self, slo_seconds: float = 60.0, max_frame_age: Optional[float] = None,
+                 viewport_boost: float = 10.0, volatility_alpha: float = 0.3,
+                 workers: int = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            slo_seconds: Target queue latency (enqueue to dispatch)
+            max_frame_age: Frames waiting longer are dropped (defaults to 2x the SLO)
+            viewport_boost: Priority added to cameras in the viewport
+            volatility_alpha: EWMA weight of the newest reading change
+            workers: Parallel analysis workers draining the queue
+            clock: Time source (injectable for simulation)
+        """
+        self.slo_seconds = slo_seconds
+        self.max_frame_age = max_frame_age if max_frame_age is not None else 2 * slo_seconds
+        self.viewport_boost = viewport_boost
+        self.volatility_alpha = volatility_alpha
+        self.workers = workers
+        self.clock = clock
+
+        self.viewport: Optional[Tuple[float, float, float, float]] = None
+        self.volatility: Dict[str, float] = {}
+        self._last_reading: Dict[str, Tuple[float, float]] = {}
+        self._pending: Dict[str, AnalysisTask] = {}
+        self._heap: List = []
+        self._seq = itertools.count()
+        self.service_time = 0.5  # EWMA of full-quality analysis seconds
+        self.level = LEVEL_NORMAL
+
+        self._latencies = deque(maxlen=1000)
+        self.counters = {
+            "submitted": 0, "dispatched": 0, "superseded": 0, "expired": 0, "shed": 0,
+            "within_slo": 0,
+        }
+        self.level_counts = [0] * len(LEVEL_NAMES)
+
+    def set_viewport(self, south: float, west: float, north: float, east: float):
+        """Set the bounds of the prioritized map area (see clear_viewport)."""
+        self.viewport = (south, west, north, east)
+        self._reprioritize()
+
+    def clear_viewport(self):
+        self.viewport = None
+        self._reprioritize()
+
+    def _in_viewport(self, location: Optional[Dict]) -> bool:
+        if self.viewport is None or not location:
+            return False
+        south, west, north, east = self.viewport
+        return south <= location["lat"] <= north and west <= location["lng"] <= east
+
+    def priority(self, task: AnalysisTask) -> float:
+        boost = self.viewport_boost if self._in_viewport(task.location) else 0.0
+        return boost + 5.0 * self.volatility.get(task.camera_id, 0.0)
+
+    def _push(self, task: AnalysisTask):
+        heapq.heappush(self._heap, (-self.priority(task), next(self._seq), task))
+
+    def _reprioritize(self):
+        self._heap = []
+        for task in self._pending.values():
+            self._push(task)
+
+    def submit(self, camera_id: str, image_path: str, location: Optional[Dict] = None,
+               payload: Optional[Dict] = None):
+        """
+        Queue a frame for analysis, replacing any frame still pending for the camera.
+
+        Args:
+            camera_id: Webcam identifier
+            image_path: Path to the fetched image
+            location: Optional {"lat", "lng"} used for viewport priority
+            payload: Extra data handed back with the task (e.g. the fetch result)
+        """
+        self.counters["submitted"] += 1
+        if camera_id in self._pending:
+            self.counters["superseded"] += 1
+        task = AnalysisTask(camera_id, image_path, location, self.clock(), payload)
+        self._pending[camera_id] = task
+        self._push(task)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _update_level(self):
+        # Time to drain the queue at full quality, spread over the workers
+        backlog = len(self._pending) * self.service_time / self.workers
+        for level in range(LEVEL_SHED, LEVEL_NORMAL - 1, -1):
+            # Enter a level when even the next-cheaper one would miss the SLO
+            if level == LEVEL_NORMAL or backlog * LEVEL_COST[level - 1] > self.slo_seconds:
+                self.level = level
+                return
+
+    def next(self) -> Optional[Tuple[AnalysisTask, Dict]]:
+        """
+        Highest-priority task and the analysis mode to run it with.
+
+        Returns:
+            (task, mode) with mode {"scale", "advanced", "level"}, or None if the queue is empty
+        """
+        self._update_level()
+        now = self.clock()
+        while self._heap:
+            _, _, task = heapq.heappop(self._heap)
+            if self._pending.get(task.camera_id) is not task:
+                continue  # superseded by a newer frame
+            del self._pending[task.camera_id]
+
+            latency = now - task.enqueued_at
+            if latency > self.max_frame_age:
+                self.counters["expired"] += 1
+                continue
+            if (self.level == LEVEL_SHED and latency > self.slo_seconds
+                    and not self._in_viewport(task.location)):
+                # Past its SLO under heavy load: skip it, a fresher frame will come
+                self.counters["shed"] += 1
+                continue
+
+            self._latencies.append(latency)
+            self.counters["dispatched"] += 1
+            self.counters["within_slo"] += 1 if latency <= self.slo_seconds else 0
+            self.level_counts[self.level] += 1
+            mode = {
+                "scale": 0.5 if self.level >= LEVEL_REDUCED_RESOLUTION else 1.0,
+                "advanced": self.level == LEVEL_NORMAL,
+                "level": LEVEL_NAMES[self.level],
+            }
+            return task, mode
+        return None
+
+    def record_result(self, camera_id: str, sun_exposure: float, wetness: float,
+                      service_seconds: Optional[float] = None, mode: Optional[Dict] = None):
+        """
+        Feed back an analysis result to update volatility and cost estimates.
+
+        Args:
+            camera_id: Webcam identifier
+            sun_exposure: Analyzed sun exposure
+            wetness: Analyzed wetness
+            service_seconds: Wall time the analysis took
+            mode: Mode the task ran with (to normalize service time to full quality)
+        """
+        previous = self._last_reading.get(camera_id)
+        if previous is not None:
+            change = abs(sun_exposure - previous[0]) + abs(wetness - previous[1])
+            old = self.volatility.get(camera_id, 0.0)
+            self.volatility[camera_id] = old + self.volatility_alpha * (change - old)
+        self._last_reading[camera_id] = (sun_exposure, wetness)
+
+        if service_seconds is not None:
+            level = LEVEL_NAMES.index(mode["level"]) if mode else LEVEL_NORMAL
+            full_cost = service_seconds / LEVEL_COST[level]
+            self.service_time += 0.2 * (full_cost - self.service_time)
+
+    def stats(self) -> Dict:
+        """Queue depth, degradation level and queue-latency SLO metrics."""
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        dispatched = self.counters["dispatched"]
+        return {
+            "queue_depth": len(self._pending),
+            "level": LEVEL_NAMES[self.level],
+            "slo_seconds": self.slo_seconds,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+            "slo_attainment": round(self.counters["within_slo"] / dispatched, 3) if dispatched else 1.0,
+            "service_time": round(self.service_time, 4),
+            "levels": dict(zip(LEVEL_NAMES, self.level_counts)),
+            **self.counters,
+        }
+
+
+def simulate_overload(num_cameras: int = 2000, viewport_fraction: float = 0.1,
+                      full_cost: float = 0.02, fetch_interval: float = 30.0,
+                      duration: float = 600.0, slo_seconds: float = 30.0, seed: int = 0) -> Dict:
+    """
+    Drive the controller into overload with a synthetic city and a simulated clock.
+
+    Every `fetch_interval` simulated seconds each camera submits a frame;
+    a single worker can analyze about fetch_interval / full_cost frames per
+    interval at full quality, so a large city overloads it. A rain front
+    makes readings volatile partway through.
+
+    Returns:
+        Controller stats plus per-group latency for viewport and other cameras
+    """
+    import numpy as np
+    from synthetic_city import SyntheticCity
+
+    now = [0.0]
+    city = SyntheticCity(num_cameras=num_cameras, seed=seed)
+    controller = AdmissionController(slo_seconds=slo_seconds, clock=lambda: now[0])
+
+    # Viewport: a box around the city center covering roughly viewport_fraction of cameras
+    half = np.sqrt(viewport_fraction) / 2
+    lat0, lng0 = float(np.median(city.lat)), float(np.median(city.lng))
+    lat_span = float(city.lat.max() - city.lat.min())
+    lng_span = float(city.lng.max() - city.lng.min())
+    controller.set_viewport(lat0 - half * lat_span, lng0 - half * lng_span,
+                            lat0 + half * lat_span, lng0 + half * lng_span)
+
+    group_latency = {"viewport": [], "other": []}
+    next_fetch = 0.0
+    while now[0] < duration:
+        if now[0] >= next_fetch:
+            city.step(fetch_interval)
+            for result in city.results():
+                controller.submit(result["webcam_id"], "", result["location"], payload=result)
+            next_fetch += fetch_interval
+
+        item = controller.next()
+        if item is None:
+            now[0] = next_fetch
+            continue
+        task, mode = item
+        group = "viewport" if controller._in_viewport(task.location) else "other"
+        group_latency[group].append(now[0] - task.enqueued_at)
+        cost = full_cost * LEVEL_COST[LEVEL_NAMES.index(mode["level"])]
+        now[0] += cost
+        analysis = task.payload["analysis"]
+        controller.record_result(task.camera_id, analysis["sun_exposure"],
+                                 analysis["wetness_confidence"], cost, mode)
+
+    stats = controller.stats()
+    for group, values in group_latency.items():
+        stats[f"{group}_dispatched"] = len(values)
+        stats[f"{group}_p95"] = round(float(np.percentile(values, 95)), 3) if values else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    # The pass/fail overload check lives in test_admission_control.py
+    print("[v0] Admission control overload simulation")
+    stats = simulate_overload()
+    for key, value in stats.items():
+        print(f"[v0]   {key}: {value}")
@@ -5,10 +5,81 @@ Enhanced wetness detection with multiple indicators and confidence scoring.
 
 import cv2
 import numpy as np
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 
-def analyze_wetness_advanced(image_path: str) -> Dict[str, float]:
+from calibration import get_profile
+
+def score_wetness_advanced(img: np.ndarray, gray: np.ndarray, profile,
+                           region: Optional[Tuple[int, int, np.ndarray]] = None,
+                           indicators: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Combine the wetness indicators of an already decoded frame.
+    
+    Args:
+        img: BGR image
+        gray: Grayscale image
+        profile: Calibration profile supplying the ROI and weights
+        region: Optional (top, bottom, mask) restricting all four methods to
+            a ground band (see SceneModel.band)
+        indicators: Result of profile.classify(img, gray, region) when the
+            caller already has it
+        
+    Returns:
+        Dictionary with wetness score and confidence
+    """
+    # Methods 1-3: reflection (specular highlights), dark surfaces and
+    # low saturation (wet surfaces often have lower saturation)
+    if indicators is None:
+        indicators = profile.classify(img, gray, region)
+    reflection_score = indicators["specular"]
+    dark_score = indicators["dark"]
+    low_sat_score = indicators["low_saturation"]
+    
+    # Method 4: Edge detection for puddles, counted over the same pixels
+    mask = profile.mask(gray.shape[:2])
+    if region is not None:
+        top, bottom, region_mask = region
+        mask = region_mask if mask is None else cv2.bitwise_and(mask[top:bottom], region_mask)
+        gray = gray[top:bottom]
+    if gray.size == 0:
+        edge_density = 0.0
+    elif mask is None:
+        edges = cv2.Canny(gray, 50, 150)
+        edge_density = cv2.countNonZero(edges) / edges.size
+    else:
+        edges = cv2.Canny(gray, 50, 150)
+        edge_density = cv2.countNonZero(cv2.bitwise_and(edges, mask)) / max(indicators["pixels"], 1)
+    
+    # Combine scores with the profile's weights (fitted weights need not
+    # sum to 1, so keep the result in range)
+    weights = profile.weights
+    wetness = min(1.0, (
+        reflection_score * weights["reflection"] +
+        dark_score * weights["dark"] +
+        low_sat_score * weights["low_saturation"] +
+        edge_density * weights["edges"]
+    ))
+    
+    # Calculate confidence based on agreement between methods
+    scores = [reflection_score, dark_score, low_sat_score, edge_density]
+    confidence = 1.0 - (np.std(scores) / np.mean(scores)) if np.mean(scores) > 0 else 0.5
+    
+    print(f"[v0] Advanced wetness analysis:")
+    print(f"  - Reflection: {reflection_score:.2%}")
+    print(f"  - Dark surfaces: {dark_score:.2%}")
+    print(f"  - Low saturation: {low_sat_score:.2%}")
+    print(f"  - Edge density: {edge_density:.2%}")
+    print(f"  - Final wetness: {wetness:.2%} (confidence: {confidence:.2%})")
+    
+    return {
+        "wetness": round(float(wetness), 3),
+        "confidence": round(float(confidence), 3),
+        "reflection_score": round(reflection_score, 3),
+        "dark_score": round(dark_score, 3)
+    }
+
+def analyze_wetness_advanced(image_path: str, camera_id: str = None) -> Dict[str, float]:
     """
     Advanced wetness analysis with multiple detection methods.
     
@@ -18,8 +89,14 @@ def analyze_wetness_advanced(image_path: str) -> Dict[str, float]:
     3. Color saturation analysis
     4. Edge detection (water puddles have distinct edges)
     
+    Methods 1-3 share one fused LUT pass using the camera's calibration
+    profile, which also supplies the ROI and the combination weights. This
+    scores the whole frame (within the profile's ROI); ground-plane scores
+    come from cv_analysis.analyze_image_segmented(..., advanced=True).
+    
     Args:
         image_path: Path to the image file
+        camera_id: Webcam identifier used to select a calibration profile
         
     Returns:
         Dictionary with wetness score and confidence
@@ -29,59 +106,14 @@ def analyze_wetness_advanced(image_path: str) -> Dict[str, float]:
         if img is None:
             return {"wetness": 0.0, "confidence": 0.0}
         
-        # Convert to different color spaces
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Method 1: Reflection detection (specular highlights)
-        _, saturation, value = cv2.split(hsv)
-        reflection_mask = cv2.bitwise_and(value > 200, saturation < 50)
-        reflection_score = np.sum(reflection_mask) / reflection_mask.size
-        
-        # Method 2: Dark surface detection
-        dark_mask = gray < 60
-        dark_score = np.sum(dark_mask) / dark_mask.size
-        
-        # Method 3: Color saturation (wet surfaces often have lower saturation)
-        low_sat_mask = saturation < 40
-        low_sat_score = np.sum(low_sat_mask) / low_sat_mask.size
-        
-        # Method 4: Edge detection for puddles
-        edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
-        
-        # Combine scores with weights
-        wetness = (
-            reflection_score * 0.35 +
-            dark_score * 0.25 +
-            low_sat_score * 0.20 +
-            edge_density * 0.20
-        )
-        
-        # Calculate confidence based on agreement between methods
-        scores = [reflection_score, dark_score, low_sat_score, edge_density]
-        confidence = 1.0 - (np.std(scores) / np.mean(scores)) if np.mean(scores) > 0 else 0.5
-        
-        print(f"[v0] Advanced wetness analysis:")
-        print(f"  - Reflection: {reflection_score:.2%}")
-        print(f"  - Dark surfaces: {dark_score:.2%}")
-        print(f"  - Low saturation: {low_sat_score:.2%}")
-        print(f"  - Edge density: {edge_density:.2%}")
-        print(f"  - Final wetness: {wetness:.2%} (confidence: {confidence:.2%})")
-        
-        return {
-            "wetness": round(wetness, 3),
-            "confidence": round(confidence, 3),
-            "reflection_score": round(reflection_score, 3),
-            "dark_score": round(dark_score, 3)
-        }
+        return score_wetness_advanced(img, gray, get_profile(camera_id))
         
     except Exception as e:
         print(f"[v0] Error in advanced wetness analysis: {str(e)}")
         return {"wetness": 0.0, "confidence": 0.0}
 
-def analyze_image_advanced(image_path: str) -> Dict:
+def analyze_image_advanced(image_path: str, camera_id: str = None) -> Dict:
     """
     Perform advanced analysis with confidence scores.
     """
@@ -90,7 +122,7 @@ def analyze_image_advanced(image_path: str) -> Dict:
     print(f"\n[v0] Advanced analysis: {image_path}")
     
     sun_exposure = analyze_sun_exposure(image_path)
-    wetness_result = analyze_wetness_advanced(image_path)
+    wetness_result = analyze_wetness_advanced(image_path, camera_id)
     
     result = {
         "sun_exposure": round(sun_exposure, 3),
@@ -0,0 +1,297 @@
+"""
+Per-Camera Calibration Profiles
+Holds each camera's wetness thresholds, scoring weights and region-of-interest
+mask. Thresholds are folded into 256-entry lookup tables so a frame is
+classified with three cv2.LUT passes and a single masked histogram instead of
+a chain of separate boolean comparisons.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+PROFILES_DIR = Path("data/calibration")
+
+# Global defaults, identical to the constants previously hard-coded in
+# cv_analysis.analyze_wetness and advanced_cv_analysis.analyze_wetness_advanced
+DEFAULT_THRESHOLDS = {
+    # analyze_wetness
+    "reflection_saturation_min": 100,
+    "reflection_value_min": 150,
+    "wet_surface_value_max": 80,
+    "wet_surface_saturation_min": 30,
+    # analyze_wetness_advanced
+    "specular_value_min": 200,
+    "specular_saturation_max": 50,
+    "dark_gray_max": 60,
+    "low_saturation_max": 40,
+}
+DEFAULT_WEIGHTS = {
+    "reflection": 0.35,
+    "dark": 0.25,
+    "low_saturation": 0.20,
+    "edges": 0.20,
+}
+
+# Bits of the fused per-pixel code
+BIT_SPECULAR = 1        # advanced reflection: V > 200 and S < 50
+BIT_LOW_SAT = 2         # S < 40
+BIT_REFLECTION = 4      # basic reflection: S > 100 and V > 150
+BIT_WET_SURFACE = 8     # basic wet surface: V < 80 and S > 30
+BIT_DARK = 16           # gray < 60
+NUM_CODES = 32
+
+
+def _lut(condition) -> np.ndarray:
+    levels = np.arange(256)
+    return np.where(condition(levels), 1, 0).astype(np.uint8)
+
+
+def _nnls(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Exact non-negative least squares for a handful of columns: the optimum
+    is the unconstrained fit on some subset of columns, so try every subset
+    and keep the best feasible one (16 small solves for 4 indicators).
+    """
+    n = X.shape[1]
+    best, best_residual = np.zeros(n), float(np.sum(y ** 2))
+    for subset in range(1, 2 ** n):
+        columns = [i for i in range(n) if subset >> i & 1]
+        coef, *_ = np.linalg.lstsq(X[:, columns], y, rcond=None)
+        if (coef < 0).any():
+            continue
+        residual = float(np.sum((X[:, columns] @ coef - y) ** 2))
+        if residual < best_residual - 1e-12:
+            best = np.zeros(n)
+            best[columns] = coef
+            best_residual = residual
+    return best
+
+
+class CalibrationProfile:
+    """
+    Calibration for one camera.
+
+    ROI polygons are given in normalized [0, 1] image coordinates so the same
+    profile works at any resolution; rasterized masks are cached per shape.
+    """
+
+    def __init__(self, camera_id: str = "default", thresholds: Optional[Dict] = None,
+                 weights: Optional[Dict] = None, roi: Optional[List[List[Tuple[float, float]]]] = None):
+        """
+        Args:
+            camera_id: Webcam identifier
+            thresholds: Overrides for DEFAULT_THRESHOLDS
+            weights: Overrides for DEFAULT_WEIGHTS
+            roi: Optional list of polygons (lists of (x, y) pairs) to analyze
+        """
+        self.camera_id = camera_id
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.roi = roi
+        self._masks: Dict[Tuple[int, int], Optional[np.ndarray]] = {}
+        self._build_luts()
+
+    def _build_luts(self):
+        t = self.thresholds
+        # Per-pixel code = (LUT_S[S] & LUT_V[V]) | LUT_G[gray]. A bit survives
+        # the AND only if both its saturation and value conditions hold;
+        # saturation-only conditions set their bit in LUT_V unconditionally.
+        self.lut_saturation = (
+            _lut(lambda s: s < t["specular_saturation_max"]) * BIT_SPECULAR
+            | _lut(lambda s: s < t["low_saturation_max"]) * BIT_LOW_SAT
+            | _lut(lambda s: s > t["reflection_saturation_min"]) * BIT_REFLECTION
+            | _lut(lambda s: s > t["wet_surface_saturation_min"]) * BIT_WET_SURFACE
+        ).astype(np.uint8)
+        self.lut_value = (
+            _lut(lambda v: v > t["specular_value_min"]) * BIT_SPECULAR
+            | np.full(256, BIT_LOW_SAT, dtype=np.uint8)
+            | _lut(lambda v: v > t["reflection_value_min"]) * BIT_REFLECTION
+            | _lut(lambda v: v < t["wet_surface_value_max"]) * BIT_WET_SURFACE
+        ).astype(np.uint8)
+        self.lut_gray = (_lut(lambda g: g < t["dark_gray_max"]) * BIT_DARK).astype(np.uint8)
+
+    def mask(self, shape: Tuple[int, int]) -> Optional[np.ndarray]:
+        """ROI mask for a frame shape, or None when the whole frame is used."""
+        if not self.roi:
+            return None
+        mask = self._masks.get(shape)
+        if mask is None:
+            height, width = shape
+            mask = np.zeros((height, width), dtype=np.uint8)
+            polygons = [
+                np.round(np.array(polygon, dtype=np.float32) * [width - 1, height - 1]).astype(np.int32)
+                for polygon in self.roi
+            ]
+            cv2.fillPoly(mask, polygons, 255)
+            self._masks[shape] = mask
+        return mask
+
+    def classify(self, img: np.ndarray, gray: Optional[np.ndarray] = None,
+                 region: Optional[Tuple[int, int, np.ndarray]] = None) -> Dict[str, float]:
+        """
+        Classify every pixel in one fused pass and return indicator ratios.
+
+        Args:
+            img: BGR image
+            gray: Optional precomputed grayscale image
+            region: Optional (top, bottom, mask) restricting analysis to rows
+                top:bottom and the mask's nonzero pixels (e.g. a scene
+                ground band, see SceneModel.band); only those rows are converted
+
+        Returns:
+            Ratios (over ROI pixels) for each wetness indicator plus the
+            combined basic wetness ("wet_indicators") and ROI pixel count
+        """
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        mask = self.mask(gray.shape[:2])
+        if region is not None:
+            top, bottom, region_mask = region
+            mask = region_mask if mask is None else cv2.bitwise_and(mask[top:bottom], region_mask)
+            img, gray = img[top:bottom], gray[top:bottom]
+        if gray.size == 0:
+            hist = np.zeros(NUM_CODES, dtype=np.float32)
+        else:
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            _, saturation, value = cv2.split(hsv)
+
+            code = cv2.bitwise_and(cv2.LUT(saturation, self.lut_saturation), cv2.LUT(value, self.lut_value))
+            code = cv2.bitwise_or(code, cv2.LUT(gray, self.lut_gray))
+            hist = cv2.calcHist([code], [0], mask, [NUM_CODES], [0, NUM_CODES]).ravel()
+
+        total = float(hist.sum())
+        if total == 0:
+            return {"specular": 0.0, "low_saturation": 0.0, "reflection": 0.0, "wet_surface": 0.0,
+                    "dark": 0.0, "wet_indicators": 0.0, "pixels": 0}
+        codes = np.arange(NUM_CODES)
+
+        def ratio(bits):
+            return float(hist[(codes & bits) != 0].sum()) / total
+
+        return {
+            "specular": ratio(BIT_SPECULAR),
+            "low_saturation": ratio(BIT_LOW_SAT),
+            "reflection": ratio(BIT_REFLECTION),
+            "wet_surface": ratio(BIT_WET_SURFACE),
+            "dark": ratio(BIT_DARK),
+            "wet_indicators": ratio(BIT_REFLECTION | BIT_WET_SURFACE),
+            "pixels": int(total),
+        }
+
+    def fit_weights(self, indicator_scores: List[List[float]], labels: List[float]) -> Dict[str, float]:
+        """
+        Fit indicator weights to labeled frames with non-negative least squares.
+
+        The fitted scale is kept (weights are not renormalized), so the
+        weighted score reproduces the labels as closely as possible.
+
+        Args:
+            indicator_scores: Rows of [reflection, dark, low_saturation, edges] scores
+            labels: Observed wetness for each row (0.0 to 1.0)
+
+        Returns:
+            The new weights (also stored on the profile)
+        """
+        X = np.asarray(indicator_scores, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        w = _nnls(X, y)
+        if w.any():
+            self.weights = dict(zip(("reflection", "dark", "low_saturation", "edges"), w.round(4).tolist()))
+        return self.weights
+
+    def to_dict(self) -> Dict:
+        return {
+            "camera_id": self.camera_id,
+            "thresholds": self.thresholds,
+            "weights": self.weights,
+            "roi": self.roi,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CalibrationProfile":
+        return cls(
+            camera_id=data.get("camera_id", "default"),
+            thresholds=data.get("thresholds"),
+            weights=data.get("weights"),
+            roi=data.get("roi"),
+        )
+
+
+class ProfileStore:
+    """
+    In-memory cache of calibration profiles backed by JSON files.
+
+    Profile files ({profiles_dir}/{camera_id}.json) are re-stat'ed at most
+    every `check_interval` seconds and reloaded when their mtime changes.
+    Cameras without a file share the default profile.
+    """
+
+    def __init__(self, profiles_dir: Path = PROFILES_DIR, check_interval: float = 5.0):
+        self.profiles_dir = Path(profiles_dir)
+        self.check_interval = check_interval
+        self.default = CalibrationProfile()
+        self._profiles: Dict[str, Tuple[Optional[float], float, CalibrationProfile]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, camera_id: str) -> Path:
+        return self.profiles_dir / f"{camera_id}.json"
+
+    def get(self, camera_id: Optional[str]) -> CalibrationProfile:
+        """
+        Profile for a camera, reloading it if its file changed.
+
+        Args:
+            camera_id: Webcam identifier (None for the default profile)
+
+        Returns:
+            CalibrationProfile
+        """
+        if camera_id is None:
+            return self.default
+        now = time.monotonic()
+        cached = self._profiles.get(camera_id)
+        if cached is not None and now - cached[1] < self.check_interval:
+            return cached[2]
+
+        with self._lock:
+            try:
+                mtime = os.stat(self._path(camera_id)).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if cached is not None and cached[0] == mtime:
+                profile = cached[2]
+            elif mtime is None:
+                profile = self.default
+            else:
+                try:
+                    with open(self._path(camera_id)) as f:
+                        profile = CalibrationProfile.from_dict(json.load(f))
+                    print(f"[v0] Loaded calibration profile for {camera_id}")
+                except Exception as e:
+                    print(f"[v0] Error loading calibration profile for {camera_id}: {str(e)}")
+                    profile = cached[2] if cached is not None else self.default
+            self._profiles[camera_id] = (mtime, now, profile)
+            return profile
+
+    def save(self, profile: CalibrationProfile):
+        """Write a profile to disk; it is picked up on the next reload check."""
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(profile.camera_id).with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(profile.to_dict(), f, indent=2)
+        os.replace(tmp, self._path(profile.camera_id))
+
+
+profile_store = ProfileStore()
+
+
+def get_profile(camera_id: Optional[str] = None) -> CalibrationProfile:
+    """Calibration profile for a camera from the shared store."""
+    return profile_store.get(camera_id)
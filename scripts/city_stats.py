@@ -0,0 +1,314 @@
+"""
+Streaming City Statistics
+Maintains running city-wide and per-district statistics that update in O(1)
+per camera update instead of re-scanning every analysis result each cycle.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+COMFORT_LEVELS = ("comfortable", "moderate", "low")
+
+# Grid size (in degrees) used to bucket cameras into districts when a
+# result does not carry an explicit district name (~2km at NYC latitude)
+DISTRICT_GRID_DEGREES = 0.02
+
+
+class RunningStats:
+    """
+    Mean and variance via Welford's algorithm, with support for removing
+    a previously added sample so a camera's old reading can be replaced.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+
+    def remove(self, x: float):
+        if self.count <= 1:
+            self.__init__()
+            return
+        delta = x - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+        # Removing the current extreme makes min/max stale; they are kept as
+        # bounds and refreshed by the aggregator when it has to.
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "variance": round(self.variance, 6),
+            "std": round(math.sqrt(self.variance), 4),
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class _GroupStats:
+    """Stats for one group of cameras (the whole city or a single district)."""
+
+    def __init__(self, track_members: bool = True):
+        self.sun = RunningStats()
+        self.wetness = RunningStats()
+        self.wet_count = 0
+        self.comfort = {level: 0 for level in COMFORT_LEVELS}
+        self.extremes_stale = False
+        # webcam_id -> sample, so stale extremes are refreshed from this
+        # group's own cameras only
+        self.members: Optional[Dict[str, Dict]] = {} if track_members else None
+
+    def add(self, webcam_id: str, sample: Dict):
+        self.sun.add(sample["sun_exposure"])
+        self.wetness.add(sample["wetness"])
+        self.wet_count += 1 if sample["wet"] else 0
+        self.comfort[sample["comfort_level"]] = self.comfort.get(sample["comfort_level"], 0) + 1
+        if self.members is not None:
+            self.members[webcam_id] = sample
+
+    def remove(self, webcam_id: str, sample: Dict):
+        self.sun.remove(sample["sun_exposure"])
+        self.wetness.remove(sample["wetness"])
+        self.wet_count -= 1 if sample["wet"] else 0
+        self.comfort[sample["comfort_level"]] -= 1
+        if self.members is not None:
+            del self.members[webcam_id]
+        if sample["sun_exposure"] in (self.sun.min, self.sun.max) or \
+                sample["wetness"] in (self.wetness.min, self.wetness.max):
+            self.extremes_stale = True
+
+    def refresh_extremes(self):
+        """Recompute min/max from the group's members (after removing an extreme)."""
+        samples = self.members.values()
+        self.sun.min = min((s["sun_exposure"] for s in samples), default=None)
+        self.sun.max = max((s["sun_exposure"] for s in samples), default=None)
+        self.wetness.min = min((s["wetness"] for s in samples), default=None)
+        self.wetness.max = max((s["wetness"] for s in samples), default=None)
+        self.extremes_stale = False
+
+    def to_dict(self) -> Dict:
+        return {
+            "cameras": self.sun.count,
+            "sun_exposure": self.sun.to_dict(),
+            "wetness": self.wetness.to_dict(),
+            "wet_locations": self.wet_count,
+            "comfort_levels": dict(self.comfort),
+        }
+
+
+def comfort_level(sun_exposure: float) -> str:
+    """Comfort bucket used throughout the pipeline."""
+    if sun_exposure > 0.7:
+        return "comfortable"
+    elif sun_exposure > 0.4:
+        return "moderate"
+    return "low"
+
+
+def district_for_result(result: Dict) -> str:
+    """
+    Resolve the district a result belongs to.
+
+    Uses an explicit "district" field when present, otherwise buckets the
+    camera location into a lat/lng grid cell.
+    """
+    if result.get("district"):
+        return result["district"]
+    location = result.get("location")
+    if not location:
+        return "unknown"
+    row = math.floor(location["lat"] / DISTRICT_GRID_DEGREES)
+    col = math.floor(location["lng"] / DISTRICT_GRID_DEGREES)
+    return f"grid_{row}_{col}"
+
+
+def extract_sample(result: Dict) -> Optional[Dict]:
+    """
+    Normalize a pipeline result (demo or production shape) into the
+    fields the aggregator tracks.
+
+    Returns:
+        Sample dictionary, or None if the result has no usable analysis
+    """
+    analysis = result.get("analysis")
+    if analysis is not None:
+        sun = analysis.get("sun_exposure")
+        wetness = analysis.get("wetness_confidence", 0.0)
+        wet = bool(analysis.get("wetness_detected", False))
+        comfort = analysis.get("comfort_level")
+    else:
+        sun = result.get("sun_exposure")
+        wetness = result.get("wetness", 0.0)
+        wet = wetness > 0.5
+        comfort = None
+    if sun is None:
+        return None
+    return {
+        "sun_exposure": float(sun),
+        "wetness": float(wetness),
+        "wet": wet,
+        "comfort_level": comfort or comfort_level(sun),
+        "district": district_for_result(result),
+    }
+
+
+class CityStatsAggregator:
+    """
+    Incrementally maintained city and district statistics.
+
+    Each camera contributes its latest reading only. An update removes the
+    camera's previous contribution and adds the new one, so the cost of an
+    update does not depend on the number of cameras. Cameras that have not
+    reported within `window_seconds` are expired from the aggregate.
+    """
+
+    def __init__(self, window_seconds: Optional[float] = None):
+        """
+        Args:
+            window_seconds: Sliding window length; None keeps readings forever
+        """
+        self.window_seconds = window_seconds
+        # The city does not keep its own member list; its extremes are
+        # derived from the district extremes
+        self.city = _GroupStats(track_members=False)
+        self.districts: Dict[str, _GroupStats] = {}
+        # webcam_id -> (update time, sample), ordered oldest update first
+        self._latest: "OrderedDict[str, tuple]" = OrderedDict()
+        self.updated_at = None
+
+    def _add(self, webcam_id: str, sample: Dict):
+        self.city.add(webcam_id, sample)
+        district = self.districts.get(sample["district"])
+        if district is None:
+            district = self.districts[sample["district"]] = _GroupStats()
+        district.add(webcam_id, sample)
+
+    def _remove(self, webcam_id: str, sample: Dict):
+        self.city.remove(webcam_id, sample)
+        district = self.districts[sample["district"]]
+        district.remove(webcam_id, sample)
+        if district.sun.count == 0:
+            del self.districts[sample["district"]]
+
+    def update(self, result: Dict, now: Optional[float] = None) -> bool:
+        """
+        Apply a single camera result.
+
+        Args:
+            result: Pipeline result dictionary
+            now: Update time in epoch seconds (defaults to time.time())
+
+        Returns:
+            True if the result was applied
+        """
+        sample = extract_sample(result)
+        webcam_id = result.get("webcam_id")
+        if sample is None or webcam_id is None:
+            return False
+
+        now = time.time() if now is None else now
+        previous = self._latest.pop(webcam_id, None)
+        if previous is not None:
+            self._remove(webcam_id, previous[1])
+        self._add(webcam_id, sample)
+        self._latest[webcam_id] = (now, sample)
+        self.updated_at = now
+        self.expire(now)
+        return True
+
+    def update_many(self, results, now: Optional[float] = None) -> int:
+        """Apply a batch of results; returns how many were applied."""
+        return sum(1 for r in results if self.update(r, now=now))
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Drop cameras whose latest reading fell out of the sliding window.
+
+        Returns:
+            Number of cameras expired
+        """
+        if self.window_seconds is None:
+            return 0
+        now = time.time() if now is None else now
+        cutoff = now - self.window_seconds
+        expired = 0
+        while self._latest:
+            webcam_id, (updated, sample) = next(iter(self._latest.items()))
+            if updated >= cutoff:
+                break
+            del self._latest[webcam_id]
+            self._remove(webcam_id, sample)
+            expired += 1
+        return expired
+
+    def snapshot(self) -> Dict:
+        """
+        Current statistics as a JSON-serializable dictionary.
+
+        Returns:
+            Dictionary with "city" and "districts" sections
+        """
+        # Only districts that lost an extreme rescan, and only their own cameras
+        for group in self.districts.values():
+            if group.extremes_stale:
+                group.refresh_extremes()
+        if self.city.extremes_stale:
+            groups = self.districts.values()
+            self.city.sun.min = min((g.sun.min for g in groups), default=None)
+            self.city.sun.max = max((g.sun.max for g in groups), default=None)
+            self.city.wetness.min = min((g.wetness.min for g in groups), default=None)
+            self.city.wetness.max = max((g.wetness.max for g in groups), default=None)
+            self.city.extremes_stale = False
+        return {
+            "city": self.city.to_dict(),
+            "districts": {name: group.to_dict() for name, group in self.districts.items()},
+            "window_seconds": self.window_seconds,
+            "updated_at": self.updated_at,
+        }
+
+    def persist(self, cache) -> bool:
+        """
+        Write the current snapshot to Redis in a single transaction.
+
+        Args:
+            cache: ClimateCache instance
+
+        Returns:
+            True if successful
+        """
+        stats = self.snapshot()
+        return cache.set_city_stats(stats["city"], districts=stats["districts"])
+
+
+if __name__ == "__main__":
+    import random
+
+    print("[v0] City stats aggregator - Testing")
+    aggregator = CityStatsAggregator(window_seconds=600)
+    for i in range(1000):
+        aggregator.update({
+            "webcam_id": f"cam-{i % 50}",
+            "location": {"lat": 40.70 + random.random() * 0.1, "lng": -74.0 + random.random() * 0.05},
+            "sun_exposure": random.random(),
+            "wetness": random.random() * 0.4,
+        })
+    city = aggregator.snapshot()["city"]
+    print(f"[v0] Cameras: {city['cameras']}, mean sun: {city['sun_exposure']['mean']:.1%}")
@@ -9,7 +9,30 @@ from pathlib import Path
 from typing import Dict, Tuple
 from datetime import datetime
 
-def analyze_sun_exposure(image_path: str) -> float:
+from calibration import get_profile
+
+# Bump whenever a change to the analysis functions alters their scores, so
+# reprocessed results can be told apart in the score history
+# (3: live and reprocessed scores use the segmented ground-plane analysis)
+ALGORITHM_VERSION = "3"
+
+def read_image(image_path: str, scale: float = 1.0):
+    """
+    Read an image, optionally downscaled (used when shedding load).
+    
+    Args:
+        image_path: Path to the image file
+        scale: Resize factor applied after reading (1.0 keeps full resolution)
+        
+    Returns:
+        BGR image, or None if it could not be read
+    """
+    img = cv2.imread(image_path)
+    if img is not None and scale != 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return img
+
+def analyze_sun_exposure(image_path: str, engine: str = "adaptive", scale: float = 1.0) -> float:
     """
     Analyze sun exposure by detecting shadow vs. bright areas.
     
@@ -20,13 +43,20 @@ def analyze_sun_exposure(image_path: str) -> float:
     
     Args:
         image_path: Path to the image file
+        engine: "adaptive" for the full-frame adaptiveThreshold pass, or
+            "tiled" for the parallel integral-image engine (faster on large frames)
+        scale: Analysis resolution relative to the original image
         
     Returns:
         Sun exposure ratio (0.0 to 1.0)
     """
+    if engine == "tiled":
+        from tiled_sun_exposure import analyze_sun_exposure_tiled
+        return analyze_sun_exposure_tiled(image_path, scale=scale)["sun_exposure"]
+    
     try:
         # Read image
-        img = cv2.imread(image_path)
+        img = read_image(image_path, scale)
         if img is None:
             print(f"[v0] Error: Could not read image {image_path}")
             return 0.0
@@ -60,7 +90,7 @@ def analyze_sun_exposure(image_path: str) -> float:
         print(f"[v0] Error analyzing sun exposure: {str(e)}")
         return 0.0
 
-def analyze_wetness(image_path: str) -> float:
+def analyze_wetness(image_path: str, camera_id: str = None, scale: float = 1.0) -> float:
     """
     Analyze wetness by detecting reflections and dark wet surfaces.
     
@@ -70,44 +100,29 @@ def analyze_wetness(image_path: str) -> float:
     3. Detect dark areas with low value (wet surfaces)
     4. Combine both indicators for wetness score
     
+    Thresholds and the region of interest come from the camera's
+    calibration profile; all indicators are evaluated in one fused
+    LUT-and-histogram pass (see calibration.py).
+    
     Args:
         image_path: Path to the image file
+        camera_id: Webcam identifier used to select a calibration profile
+        scale: Analysis resolution relative to the original image
         
     Returns:
         Wetness ratio (0.0 to 1.0)
     """
     try:
         # Read image
-        img = cv2.imread(image_path)
+        img = read_image(image_path, scale)
         if img is None:
             print(f"[v0] Error: Could not read image {image_path}")
             return 0.0
         
-        # Convert to HSV color space
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Extract channels
-        _, saturation, value = cv2.split(hsv)
-        
-        # Detect reflections (high saturation, high value)
-        reflection_mask = cv2.bitwise_and(
-            saturation > 100,
-            value > 150
-        )
-        
-        # Detect dark wet surfaces (low value, moderate saturation)
-        wet_surface_mask = cv2.bitwise_and(
-            value < 80,
-            saturation > 30
-        )
-        
-        # Combine both indicators
-        wetness_mask = cv2.bitwise_or(reflection_mask.astype(np.uint8), wet_surface_mask.astype(np.uint8))
-        
-        # Calculate wetness percentage
-        total_pixels = wetness_mask.size
-        wet_pixels = np.sum(wetness_mask > 0)
-        wetness = wet_pixels / total_pixels
+        # Reflections (high saturation, high value) or dark wet surfaces
+        # (low value, moderate saturation), counted over the camera's ROI
+        indicators = get_profile(camera_id).classify(img)
+        wetness = indicators["wet_indicators"]
         
         print(f"[v0] Wetness analysis: {wetness:.2%} wet indicators")
         return wetness
@@ -116,20 +131,109 @@ def analyze_wetness(image_path: str) -> float:
         print(f"[v0] Error analyzing wetness: {str(e)}")
         return 0.0
 
-def analyze_image(image_path: str) -> Dict[str, float]:
+def analyze_image_segmented(image_path: str, camera_id: str, scale: float = 1.0,
+                            learn: bool = True, advanced: bool = False) -> Dict[str, float]:
+    """
+    Analyze only the ground plane of a camera's frame.
+    
+    The frame feeds the camera's scene segmenter; once a ground mask has
+    been learned, sun exposure and wetness are computed over the masked
+    pixels only, converting and thresholding just the rows the ground
+    covers. Until then the full frame is used.
+    
+    Args:
+        image_path: Path to the image file
+        camera_id: Webcam identifier
+        scale: Analysis resolution relative to the original image
+        learn: Feed the frame to the segmenter; with False the camera's
+            current (or persisted) mask is only read, e.g. when rescoring
+            archived frames
+        advanced: Also compute the advanced wetness score and confidence
+            (see advanced_cv_analysis) over the same ground pixels, reusing
+            this pass's decoded frame and indicators
+        
+    Returns:
+        Dictionary with analysis results, including the ground fraction and
+        the mask_id of the ground mask used (None for the full-frame
+        fallback), and an "error" message, with zero scores, if the image is
+        unreadable
+    """
+    from scene_segmentation import scene_segmenter
+    
+    img = read_image(image_path, scale)
+    if img is None:
+        print(f"[v0] Error: Could not read image {image_path}")
+        return {"sun_exposure": 0.0, "wetness": 0.0, "ground_fraction": 0.0, "mask_id": None,
+                "timestamp": datetime.now().isoformat(),
+                "error": f"Could not read image {image_path}"}
+    
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    model = scene_segmenter.observe(camera_id, img) if learn else scene_segmenter.model(camera_id)
+    region = model.band(gray.shape) if model is not None else None
+    
+    # Threshold only the band of rows the ground covers and count the
+    # bright pixels under the ground mask
+    if region is not None:
+        top, bottom, mask = region
+        crop = gray[top:bottom]
+    else:
+        crop, mask = gray, None
+    if crop.size:
+        blurred = cv2.GaussianBlur(crop, (5, 5), 0)
+        binary = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        if mask is None:
+            sun_exposure = cv2.countNonZero(binary) / binary.size
+        else:
+            ground = cv2.countNonZero(mask)
+            sun_exposure = cv2.countNonZero(cv2.bitwise_and(binary, mask)) / ground if ground else 0.0
+    else:
+        sun_exposure = 0.0
+    
+    profile = get_profile(camera_id)
+    indicators = profile.classify(img, gray, region)
+    
+    result = {
+        "sun_exposure": round(sun_exposure, 3),
+        "wetness": round(indicators["wet_indicators"], 3),
+        "ground_fraction": round(model.ground_fraction(), 3) if model is not None else 1.0,
+        "mask_id": model.mask_id() if model is not None else None,
+        "timestamp": datetime.now().isoformat()
+    }
+    if advanced:
+        from advanced_cv_analysis import score_wetness_advanced
+        scores = score_wetness_advanced(img, gray, profile, region, indicators)
+        result["wetness_advanced"] = scores["wetness"]
+        result["wetness_confidence"] = scores["confidence"]
+    
+    print(f"[v0] Segmented analysis: Sun={result['sun_exposure']:.1%}, Wetness={result['wetness']:.1%} "
+          f"over {result['ground_fraction']:.0%} of frame")
+    
+    return result
+
+def analyze_image(image_path: str, camera_id: str = None, segment: bool = False,
+                  scale: float = 1.0, advanced: bool = False) -> Dict[str, float]:
     """
     Perform complete analysis on an image.
     
     Args:
         image_path: Path to the image file
+        camera_id: Webcam identifier used to select a calibration profile
+        segment: Analyze only the camera's learned ground plane
+            (requires camera_id; see analyze_image_segmented)
+        scale: Analysis resolution relative to the original image
+        advanced: With segment, also return the advanced wetness score and
+            confidence of the ground plane
         
     Returns:
         Dictionary with analysis results
     """
     print(f"\n[v0] Analyzing image: {image_path}")
     
-    sun_exposure = analyze_sun_exposure(image_path)
-    wetness = analyze_wetness(image_path)
+    if segment and camera_id is not None:
+        return analyze_image_segmented(image_path, camera_id, scale, advanced=advanced)
+    
+    sun_exposure = analyze_sun_exposure(image_path, scale=scale)
+    wetness = analyze_wetness(image_path, camera_id, scale)
     
     result = {
         "sun_exposure": round(sun_exposure, 3),
@@ -143,29 +247,47 @@ def analyze_image(image_path: str) -> Dict[str, float]:
 
 def batch_analyze_images(image_dir: str = "data/webcam_images") -> Dict[str, Dict]:
     """
-    Analyze all images in a directory.
+    Analyze all images in an image archive.
+    
+    Indexed frames are listed from the archive index rather than by globbing
+    the directory. Image files directly in the root (the legacy flat layout,
+    or anything else dropped there) are analyzed in place as well.
     
     Args:
-        image_dir: Directory containing webcam images
+        image_dir: Root directory of the image archive
         
     Returns:
-        Dictionary mapping image filenames to analysis results
+        Dictionary mapping archive-relative frame paths (or file names for
+        loose files) to analysis results
     """
+    from image_archive import ImageArchive
+    
     image_path = Path(image_dir)
     
     if not image_path.exists():
         print(f"[v0] Error: Directory {image_dir} does not exist")
         return {}
     
+    archive = ImageArchive(image_dir)
+    
     results = {}
-    image_files = list(image_path.glob("*.jpg")) + list(image_path.glob("*.png"))
+    frames = list(archive.iter_frames())
+    loose = list(archive.iter_loose())
+    
+    print(f"[v0] Found {len(frames)} archived and {len(loose)} loose images to analyze")
     
-    print(f"[v0] Found {len(image_files)} images to analyze")
+    for frame in frames:
+        with archive.local_path(frame) as local_path:
+            result = analyze_image(local_path, frame["camera_id"])
+        key = frame["path"] if frame["bundle_offset"] is None else f"{frame['path']}@{frame['bundle_offset']}"
+        results[key] = result
     
-    for img_file in image_files:
-        result = analyze_image(str(img_file))
-        results[img_file.name] = result
+    for path, camera_id in loose:
+        if camera_id is None:
+            print(f"[v0] {Path(path).name} does not match the camera file naming; using the default profile")
+        results[Path(path).name] = analyze_image(path, camera_id)
     
+    archive.close()
     print(f"\n[v0] Batch analysis complete: {len(results)} images processed")
     return results
 
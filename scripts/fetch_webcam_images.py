@@ -9,38 +9,57 @@ import aiohttp
 from datetime import datetime
 from pathlib import Path
 
-# Predefined list of public webcam URLs
+from image_archive import ImageArchive
+
+# Predefined list of public webcam URLs (lat/lng place the camera on the map
+# and drive viewport priority in the analysis queue)
 WEBCAM_URLS = [
     {
         "id": "cam-1",
         "name": "Downtown Plaza",
-        "url": "https://example.com/cam1/image.jpg"
+        "url": "https://example.com/cam1/image.jpg",
+        "lat": 40.7589,
+        "lng": -73.9851
     },
     {
         "id": "cam-2",
         "name": "Central Park North",
-        "url": "https://example.com/cam2/image.jpg"
+        "url": "https://example.com/cam2/image.jpg",
+        "lat": 40.7967,
+        "lng": -73.9496
     },
     {
         "id": "cam-3",
         "name": "Brooklyn Bridge",
-        "url": "https://example.com/cam3/image.jpg"
+        "url": "https://example.com/cam3/image.jpg",
+        "lat": 40.7061,
+        "lng": -73.9969
     },
     {
         "id": "cam-4",
         "name": "Times Square",
-        "url": "https://example.com/cam4/image.jpg"
+        "url": "https://example.com/cam4/image.jpg",
+        "lat": 40.758,
+        "lng": -73.9855
     },
     {
         "id": "cam-5",
         "name": "Hudson Yards",
-        "url": "https://example.com/cam5/image.jpg"
+        "url": "https://example.com/cam5/image.jpg",
+        "lat": 40.7536,
+        "lng": -74.0014
     },
 ]
 
-# Create output directory for downloaded images
+# Downloaded images are sharded per camera/day with size and age budgets
 OUTPUT_DIR = Path("data/webcam_images")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+archive = ImageArchive(str(OUTPUT_DIR))
+
+def _location(webcam: dict):
+    """Camera location as {"lat", "lng"}, or None if not configured."""
+    if "lat" not in webcam or "lng" not in webcam:
+        return None
+    return {"lat": webcam["lat"], "lng": webcam["lng"]}
 
 async def fetch_image(session: aiohttp.ClientSession, webcam: dict) -> dict:
     """
@@ -48,7 +67,7 @@ async def fetch_image(session: aiohttp.ClientSession, webcam: dict) -> dict:
     
     Args:
         session: aiohttp ClientSession for making requests
-        webcam: Dictionary containing webcam id, name, and url
+        webcam: Dictionary containing webcam id, name, url, lat and lng
         
     Returns:
         Dictionary with fetch result including success status and file path
@@ -56,29 +75,34 @@ async def fetch_image(session: aiohttp.ClientSession, webcam: dict) -> dict:
     try:
         async with session.get(webcam["url"], timeout=10) as response:
             if response.status == 200:
-                # Save image with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{webcam['id']}_{timestamp}.jpg"
-                filepath = OUTPUT_DIR / filename
+                # Save image into the archive (disk and index work off the event loop)
+                captured_at = datetime.now()
+                timestamp = captured_at.strftime("%Y%m%d_%H%M%S")
 
                 content = await response.read()
-                import aiofiles
-                async with aiofiles.open(filepath, "wb") as f:
-                    await f.write(content)
+                loop = asyncio.get_running_loop()
+                filepath = await loop.run_in_executor(
+                    None, archive.add, webcam["id"], content, captured_at
+                )
 
                 print(f"[v0] Successfully fetched {webcam['name']}: {filepath}")
                 return {
                     "id": webcam["id"],
                     "name": webcam["name"],
+                    "location": _location(webcam),
                     "success": True,
                     "filepath": str(filepath),
-                    "timestamp": timestamp
+                    "timestamp": timestamp,
+                    # Matches the archive index, so live and reprocessed
+                    # scores of a frame line up in the score history
+                    "captured_at": captured_at.isoformat()
                 }
             else:
                 print(f"[v0] Failed to fetch {webcam['name']}: HTTP {response.status}")
                 return {
                     "id": webcam["id"],
                     "name": webcam["name"],
+                    "location": _location(webcam),
                     "success": False,
                     "error": f"HTTP {response.status}"
                 }
@@ -87,6 +111,7 @@ async def fetch_image(session: aiohttp.ClientSession, webcam: dict) -> dict:
         return {
             "id": webcam["id"],
             "name": webcam["name"],
+            "location": _location(webcam),
             "success": False,
             "error": str(e)
         }
@@ -114,6 +139,9 @@ async def continuous_fetch(interval_seconds: int = 300):
     """
     print(f"[v0] Starting continuous image fetching (interval: {interval_seconds}s)")
     
+    # Background compaction and eviction keep the archive within budget
+    archive.start_maintenance()
+    
     while True:
         print(f"\n[v0] Starting fetch cycle at {datetime.now()}")
         await fetch_all_images()
@@ -0,0 +1,421 @@
+"""
+Rolling Image Archive
+Stores webcam frames sharded by camera and day, tracks them in a SQLite
+index, enforces total-size and age budgets, and can compact old days into
+append-only bundle files so the directory tree stays small.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_ROOT = Path("data/webcam_images")
+INDEX_NAME = "index.sqlite3"
+
+# Legacy flat layout: {camera_id}_{YYYYmmdd}_{HHMMSS}.jpg
+_IMAGE_EXTENSIONS = (".jpg", ".png")
+_FLAT_NAME = re.compile(r"^(?P<camera>.+)_(?P<day>\d{8})_(?P<time>\d{6})\.(?P<ext>jpg|png)$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    camera_id TEXT NOT NULL,
+    captured_at TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    bundle_offset INTEGER
+);
+CREATE INDEX IF NOT EXISTS frames_by_time ON frames (captured_at);
+CREATE INDEX IF NOT EXISTS frames_by_camera ON frames (camera_id, captured_at);
+"""
+
+
+class ImageArchive:
+    """
+    Size- and age-bounded archive of webcam frames.
+
+    Layout: {root}/{camera_id}/{YYYYmmdd}/{HHMMSS}.jpg for loose frames and
+    {root}/{camera_id}/{YYYYmmdd}.bundle for compacted days. Every frame has
+    a row in the index, so listing and eviction never walk the directory
+    tree. Bundled frames store their byte offset in the bundle file.
+    """
+
+    def __init__(
+        self,
+        root: str = str(DEFAULT_ROOT),
+        max_bytes: Optional[int] = 5 * 1024 ** 3,
+        max_age_days: Optional[float] = 30,
+        compact_after_days: Optional[float] = 2,
+    ):
+        """
+        Args:
+            root: Archive root directory
+            max_bytes: Total size budget (None for unlimited)
+            max_age_days: Frames older than this are evicted (None to keep)
+            compact_after_days: Days older than this are packed into bundles
+                (None to disable compaction)
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.compact_after_days = compact_after_days
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / INDEX_NAME), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    def close(self):
+        self.stop_maintenance()
+        with self._lock:
+            self._db.close()
+
+    def _frame_path(self, camera_id: str, captured_at: datetime, ext: str = "jpg") -> Path:
+        return self.root / camera_id / captured_at.strftime("%Y%m%d") / f"{captured_at.strftime('%H%M%S')}.{ext}"
+
+    def add(self, camera_id: str, content: bytes, captured_at: Optional[datetime] = None,
+            ext: str = "jpg") -> str:
+        """
+        Store a frame and index it.
+
+        Args:
+            camera_id: Webcam identifier
+            content: Encoded image bytes
+            captured_at: Capture time (defaults to now)
+            ext: File extension
+
+        Returns:
+            Path of the stored frame
+        """
+        captured_at = captured_at or datetime.now()
+        path = self._frame_path(camera_id, captured_at, ext)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+        self._index(camera_id, captured_at, path, len(content))
+        return str(path)
+
+    def _index(self, camera_id: str, captured_at: datetime, path: Path, size: int,
+               bundle_offset: Optional[int] = None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO frames (camera_id, captured_at, path, size, bundle_offset) VALUES (?, ?, ?, ?, ?)",
+                (camera_id, captured_at.isoformat(), str(path.relative_to(self.root)), size, bundle_offset),
+            )
+
+    def import_flat(self) -> int:
+        """
+        Move frames from the legacy flat layout into the sharded layout.
+
+        Returns:
+            Number of frames imported
+        """
+        imported = 0
+        for entry in os.scandir(self.root):
+            match = _FLAT_NAME.match(entry.name)
+            if not entry.is_file() or not match:
+                continue
+            captured_at = datetime.strptime(match["day"] + match["time"], "%Y%m%d%H%M%S")
+            path = self._frame_path(match["camera"], captured_at, match["ext"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(entry.path, path)
+            self._index(match["camera"], captured_at, path, path.stat().st_size)
+            imported += 1
+        if imported:
+            print(f"[v0] Imported {imported} frames into archive index")
+        return imported
+
+    def iter_loose(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Image files sitting directly in the archive root (not indexed), left
+        in place.
+
+        Yields:
+            (path, camera_id) pairs; camera_id is None when the file name
+            does not follow the legacy {camera}_{day}_{time} layout
+        """
+        for entry in sorted(os.scandir(self.root), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(_IMAGE_EXTENSIONS):
+                match = _FLAT_NAME.match(entry.name)
+                yield entry.path, match["camera"] if match else None
+
+    def iter_frames(self, camera_id: Optional[str] = None, since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> Iterator[Dict]:
+        """
+        Iterate indexed frames in capture order.
+
+        Args:
+            camera_id: Only frames from this camera
+            since: Only frames captured at or after this time
+            until: Only frames captured before this time
+
+        Yields:
+            Frame dictionaries (camera_id, captured_at, path, size, bundle_offset)
+        """
+        query = "SELECT id, camera_id, captured_at, path, size, bundle_offset FROM frames WHERE 1=1"
+        params: List = []
+        if camera_id is not None:
+            query += " AND camera_id = ?"
+            params.append(camera_id)
+        if since is not None:
+            query += " AND captured_at >= ?"
+            params.append(since.isoformat())
+        if until is not None:
+            query += " AND captured_at < ?"
+            params.append(until.isoformat())
+        query += " ORDER BY captured_at, id"
+        with self._lock:
+            rows = [dict(row) for row in self._db.execute(query, params)]
+        yield from rows
+
+    def get(self, frame_id: int) -> Optional[Dict]:
+        """Look up a frame by index id (None once it has been evicted)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, camera_id, captured_at, path, size, bundle_offset FROM frames WHERE id = ?",
+                (frame_id,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def read(self, frame: Dict) -> bytes:
+        """Read a frame's bytes, whether loose or bundled."""
+        path = self.root / frame["path"]
+        with open(path, "rb") as f:
+            if frame["bundle_offset"] is not None:
+                f.seek(frame["bundle_offset"])
+                return f.read(frame["size"])
+            return f.read()
+
+    @contextmanager
+    def local_path(self, frame: Dict) -> Iterator[str]:
+        """
+        Yield a filesystem path for a frame, extracting bundled frames to a
+        temporary file for tools (like cv2.imread) that need a path.
+        """
+        if frame["bundle_offset"] is None:
+            yield str(self.root / frame["path"])
+            return
+        # cv2.imread sniffs the format from the content, not the extension
+        fd, tmp = tempfile.mkstemp(suffix=".jpg")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.read(frame))
+            yield tmp
+        finally:
+            os.unlink(tmp)
+
+    def _file_bytes(self, rel_path: str) -> int:
+        try:
+            return (self.root / rel_path).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def total_bytes(self) -> int:
+        """
+        Bytes on disk: loose frames from the index, bundles by file size
+        (a bundle keeps the space of evicted frames until it is deleted).
+        """
+        with self._lock:
+            loose = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM frames WHERE bundle_offset IS NULL"
+            ).fetchone()[0]
+            bundles = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT path FROM frames WHERE bundle_offset IS NOT NULL"
+            )]
+        return loose + sum(self._file_bytes(bundle) for bundle in bundles)
+
+    def _delete_rows(self, rows: List[sqlite3.Row]):
+        # Bundles are only removed once every frame in them is gone
+        bundles = set()
+        dirs = set()
+        for row in rows:
+            if row["bundle_offset"] is None:
+                try:
+                    os.unlink(self.root / row["path"])
+                except FileNotFoundError:
+                    pass
+                dirs.add(Path(row["path"]).parent)
+            else:
+                bundles.add(row["path"])
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM frames WHERE id = ?", [(row["id"],) for row in rows])
+            for bundle in bundles:
+                remaining = self._db.execute("SELECT 1 FROM frames WHERE path = ? LIMIT 1", (bundle,)).fetchone()
+                if remaining is None:
+                    try:
+                        os.unlink(self.root / bundle)
+                    except FileNotFoundError:
+                        pass
+                    dirs.add(Path(bundle).parent)
+        self._prune_dirs(dirs)
+
+    def evict(self, now: Optional[datetime] = None) -> int:
+        """
+        Enforce the age and size budgets, oldest frames first.
+
+        Returns:
+            Number of frames evicted
+        """
+        now = now or datetime.now()
+        evicted = 0
+        if self.max_age_days is not None:
+            cutoff = (now - timedelta(days=self.max_age_days)).isoformat()
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, path, bundle_offset FROM frames WHERE captured_at < ?", (cutoff,)
+                ).fetchall()
+            self._delete_rows(rows)
+            evicted += len(rows)
+
+        if self.max_bytes is not None:
+            excess = self.total_bytes() - self.max_bytes
+            while excess > 0:
+                with self._lock:
+                    rows = self._db.execute(
+                        "SELECT id, path, size, bundle_offset FROM frames ORDER BY captured_at, id LIMIT 500"
+                    ).fetchall()
+                if not rows:
+                    break
+                batch = []
+                bundles = set()
+                for row in rows:
+                    if row["bundle_offset"] is None:
+                        batch.append(row)
+                        excess -= row["size"]
+                    elif row["path"] not in bundles:
+                        # Deleting bundle rows frees nothing until the file
+                        # goes, so a bundled day is evicted whole
+                        bundles.add(row["path"])
+                        with self._lock:
+                            batch.extend(self._db.execute(
+                                "SELECT id, path, size, bundle_offset FROM frames WHERE path = ?",
+                                (row["path"],),
+                            ).fetchall())
+                        excess -= self._file_bytes(row["path"])
+                    if excess <= 0:
+                        break
+                self._delete_rows(batch)
+                evicted += len(batch)
+
+        if evicted:
+            print(f"[v0] Archive evicted {evicted} frames")
+        return evicted
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Pack loose frames from days older than compact_after_days into one
+        append-only bundle file per camera-day.
+
+        Returns:
+            Number of frames packed
+        """
+        if self.compact_after_days is None:
+            return 0
+        now = now or datetime.now()
+        cutoff_day = (now - timedelta(days=self.compact_after_days)).strftime("%Y%m%d")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, camera_id, captured_at, path, size FROM frames "
+                "WHERE bundle_offset IS NULL ORDER BY camera_id, captured_at"
+            ).fetchall()
+
+        groups: Dict[tuple, List[sqlite3.Row]] = {}
+        for row in rows:
+            day = Path(row["path"]).parent.name
+            if day < cutoff_day:
+                groups.setdefault((row["camera_id"], day), []).append(row)
+
+        packed = 0
+        for (camera_id, day), frames in groups.items():
+            bundle_rel = Path(camera_id) / f"{day}.bundle"
+            updates = []
+            with open(self.root / bundle_rel, "ab") as bundle:
+                for row in frames:
+                    offset = bundle.tell()
+                    with open(self.root / row["path"], "rb") as f:
+                        content = f.read()
+                    bundle.write(content)
+                    updates.append((str(bundle_rel), offset, len(content), row["id"]))
+                bundle.flush()
+                os.fsync(bundle.fileno())
+            with self._lock, self._db:
+                self._db.executemany(
+                    "UPDATE frames SET path = ?, bundle_offset = ?, size = ? WHERE id = ?", updates
+                )
+            for row in frames:
+                try:
+                    os.unlink(self.root / row["path"])
+                except FileNotFoundError:
+                    pass
+            self._prune_dirs({Path(camera_id) / day})
+            packed += len(frames)
+
+        if packed:
+            print(f"[v0] Archive compacted {packed} frames into {len(groups)} bundles")
+        return packed
+
+    def _prune_dirs(self, dirs):
+        # Only the day and camera directories that just lost files are
+        # checked; rmdir refuses non-empty directories
+        for rel in sorted(dirs, key=lambda d: len(d.parts), reverse=True):
+            for directory in (rel, rel.parent):
+                if directory == Path("."):
+                    continue
+                try:
+                    os.rmdir(self.root / directory)
+                except OSError:
+                    break
+
+    def maintain(self) -> Dict[str, int]:
+        """Run one compaction and eviction pass."""
+        return {"compacted": self.compact(), "evicted": self.evict()}
+
+    async def maintenance_loop(self, interval_seconds: int = 600):
+        """
+        Run maintain() periodically in a worker thread so the event loop
+        (e.g. the fetch loop) is never blocked by disk work.
+
+        Args:
+            interval_seconds: Time between maintenance passes
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.maintain)
+            except Exception as e:
+                print(f"[v0] Archive maintenance error: {str(e)}")
+            await asyncio.sleep(interval_seconds)
+
+    def start_maintenance(self, interval_seconds: int = 600) -> asyncio.Task:
+        """
+        Start maintenance_loop on the running event loop (once per archive).
+        The task is kept on the archive so it is not garbage collected.
+        """
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.get_running_loop().create_task(
+                self.maintenance_loop(interval_seconds)
+            )
+        return self._maintenance_task
+
+    def stop_maintenance(self):
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+
+
+if __name__ == "__main__":
+    archive = ImageArchive()
+    archive.import_flat()
+    result = archive.maintain()
+    print(f"[v0] Archive size: {archive.total_bytes() / 1024 ** 2:.1f}MB "
+          f"(compacted {result['compacted']}, evicted {result['evicted']})")
@@ -5,22 +5,74 @@ Includes DEMO MODE for testing without real webcam URLs.
 """
 
 import asyncio
-import json
+import os
+import time
 from pathlib import Path
 from datetime import datetime, timezone
 import sys
 import argparse
 
-DEMO_MODE = True  # Set to False to use real webcam URLs
+from admission_control import AdmissionController
+from city_stats import CityStatsAggregator
+from result_writer import ResultWriter
+from score_history import ScoreHistory
 
-if not DEMO_MODE:
-    from fetch_webcam_images import fetch_all_images
-    from cv_analysis import analyze_image
+DEMO_MODE = True  # Set to False to use real webcam URLs
 
 # Output directory for analysis results
 RESULTS_DIR = Path("data/analysis_results")
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
+# Optional SyntheticCity used instead of the 5 demo cameras (--synthetic N)
+synthetic_city = None
+
+# Running city/district stats; cameras silent for two default cycles expire
+city_stats = CityStatsAggregator(window_seconds=600)
+
+# Decides which fetched frames get analyzed first (and how) when a cycle
+# has more work than time. Frames left at the deadline stay queued but are
+# superseded by the camera's next fetch (or expire after max_frame_age)
+admission = AdmissionController(slo_seconds=60.0)
+
+def create_cache():
+    """
+    ClimateCache for the Redis URL in REDIS_URL, or None when Redis is not
+    configured (or the redis package is missing). CACHE_CODEC=binary stores
+    webcam values with wire_format.RecordCodec instead of JSON.
+    """
+    redis_url = os.environ.get("REDIS_URL")
+    if not redis_url:
+        return None
+    sys.path.append(str(Path(__file__).resolve().parent.parent / "lib"))
+    try:
+        from redis_cache import ClimateCache
+    except ImportError as e:
+        print(f"[v0] Redis cache disabled: {str(e)}")
+        return None
+    codec = None
+    if os.environ.get("CACHE_CODEC", "json") == "binary":
+        from wire_format import RecordCodec
+        codec = RecordCodec()
+    print(f"[v0] Caching results in Redis at {redis_url} ({'binary' if codec else 'json'} values)")
+    return ClimateCache(redis_url, codec=codec)
+
+# Persistence runs on a background writer so disk I/O never blocks the loop.
+# It is created by the pipeline entry points (see create_writer), so
+# importing this module opens no database or Redis connection
+result_writer = None
+
+def create_writer() -> ResultWriter:
+    """
+    ResultWriter for the current mode. Each batch also goes to Redis when
+    configured (webcams plus city stats in one round trip each). Only
+    production scores go into the score history, tagged with the algorithm
+    version, so reprocessing runs can be compared against them; demo and
+    synthetic runs never open it.
+    """
+    production = not DEMO_MODE and synthetic_city is None
+    return ResultWriter(RESULTS_DIR, cache=create_cache(),
+                        history=ScoreHistory() if production else None)
+
 def generate_demo_data():
     """Generate realistic demo data based on time of day"""
     hour = datetime.now().hour
@@ -81,77 +133,112 @@ def generate_demo_data():
     
     return results
 
-async def process_pipeline():
+async def process_pipeline(deadline_seconds: float = None):
     """
     Run the complete pipeline: fetch images and analyze them.
+    
+    Args:
+        deadline_seconds: Time budget for the whole cycle (fetch included),
+            counted from the call; analysis stops once it is spent
     """
     print("[v0] Starting integrated pipeline...")
+    started = time.monotonic()
+    admission_stats = None
     
-    if DEMO_MODE:
+    if synthetic_city is not None:
+        print(f"\n[v0] Generating synthetic data for {synthetic_city.num_cameras} cameras...")
+        synthetic_city.step(60.0)
+        analysis_results = synthetic_city.results()
+        print(f"[v0] Generated {len(analysis_results)} synthetic results")
+    elif DEMO_MODE:
         print("\n[v0] Running in DEMO MODE - generating realistic mock data...")
         analysis_results = generate_demo_data()
         print(f"[v0] Generated {len(analysis_results)} demo results")
     else:
+        from fetch_webcam_images import fetch_all_images
+        from cv_analysis import ALGORITHM_VERSION, analyze_image
+        
         # Step 1: Fetch images from all webcams
         print("\n[v0] Step 1: Fetching images from webcams...")
         fetch_results = await fetch_all_images()
         
-        # Step 2: Analyze each successfully fetched image
-        print("\n[v0] Step 2: Analyzing images with computer vision...")
-        analysis_results = []
-        
         for fetch_result in fetch_results:
             if fetch_result["success"]:
-                # Analyze the image
-                image_path = fetch_result["filepath"]
-                analysis = analyze_image(image_path)
-                
-                # Combine fetch and analysis results
-                combined_result = {
-                    "webcam_id": fetch_result["id"],
-                    "webcam_name": fetch_result["name"],
-                    "image_path": image_path,
-                    "timestamp": fetch_result["timestamp"],
-                    "sun_exposure": analysis["sun_exposure"],
-                    "wetness": analysis["wetness"],
-                    "analysis_timestamp": analysis["timestamp"]
-                }
-                
-                analysis_results.append(combined_result)
+                admission.submit(fetch_result["id"], fetch_result["filepath"],
+                                 fetch_result.get("location"), payload=fetch_result)
             else:
                 print(f"[v0] Skipping analysis for {fetch_result['name']}: {fetch_result.get('error', 'Unknown error')}")
+        
+        # Step 2: Analyze queued images in priority order, degrading under load
+        print(f"\n[v0] Step 2: Analyzing {len(admission)} images with computer vision...")
+        analysis_results = []
+        
+        while deadline_seconds is None or time.monotonic() - started < deadline_seconds:
+            item = admission.next()
+            if item is None:
+                break
+            task, mode = item
+            fetch_result = task.payload
+            
+            # Analyze the image
+            analysis_started = time.monotonic()
+            # One read of the frame; advanced wetness (unless shed) is scored
+            # over the same ground pixels
+            analysis = analyze_image(task.image_path, task.camera_id, segment=True,
+                                     scale=mode["scale"], advanced=mode["advanced"])
+            admission.record_result(task.camera_id, analysis["sun_exposure"], analysis["wetness"],
+                                    time.monotonic() - analysis_started, mode)
+            
+            # Combine fetch and analysis results
+            combined_result = {
+                "webcam_id": fetch_result["id"],
+                "webcam_name": fetch_result["name"],
+                "location": fetch_result.get("location"),
+                "image_path": task.image_path,
+                "timestamp": fetch_result["timestamp"],
+                "captured_at": fetch_result["captured_at"],
+                "algorithm_version": ALGORITHM_VERSION,
+                "sun_exposure": analysis["sun_exposure"],
+                "wetness": analysis["wetness"],
+                "analysis_timestamp": analysis["timestamp"],
+                "analysis_mode": mode["level"],
+                "ground_fraction": analysis["ground_fraction"],
+                "mask_id": analysis["mask_id"],
+            }
+            if "wetness_advanced" in analysis:
+                combined_result["wetness_advanced"] = analysis["wetness_advanced"]
+                combined_result["wetness_confidence"] = analysis["wetness_confidence"]
+            
+            analysis_results.append(combined_result)
+            # Let the fetch loop and writer run between frames
+            await asyncio.sleep(0)
+        
+        admission_stats = admission.stats()
+        print(f"[v0] Admission stats: {admission_stats}")
     
-    # Step 3: Save results to JSON
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    results_file = RESULTS_DIR / f"analysis_{timestamp}.json"
+    # Step 3: Fold results into the running city statistics
+    city_stats.update_many(analysis_results)
+    stats = city_stats.snapshot()
     
-    output_data = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "results": analysis_results,
-        "total_analyzed": len(analysis_results),
-        "mode": "demo" if DEMO_MODE else "production"
+    # Step 4: Queue results for persistence (written by the background writer);
+    # the admission queue/SLO stats ride along so /api/latest serves them
+    extra = {
+        "mode": "demo" if DEMO_MODE else "production",
+        "city_stats": stats,
     }
+    if admission_stats is not None:
+        extra["admission"] = admission_stats
+    await result_writer.submit(analysis_results, extra)
     
-    with open(results_file, "w") as f:
-        json.dump(output_data, f, indent=2)
-    
-    print(f"\n[v0] Pipeline complete! Results saved to: {results_file}")
+    print(f"\n[v0] Pipeline complete! Results queued for {RESULTS_DIR}")
     print(f"[v0] Analyzed {len(analysis_results)} webcam images")
     
     # Print summary
-    if analysis_results:
-        if DEMO_MODE:
-            avg_sun = sum(r["analysis"]["sun_exposure"] for r in analysis_results) / len(analysis_results)
-            wet_count = sum(1 for r in analysis_results if r["analysis"]["wetness_detected"])
-        else:
-            avg_sun = sum(r["sun_exposure"] for r in analysis_results) / len(analysis_results)
-            avg_wetness = sum(r["wetness"] for r in analysis_results) / len(analysis_results)
-            print(f"[v0] Average sun exposure: {avg_sun:.1%}")
-            print(f"[v0] Average wetness: {avg_wetness:.1%}")
-            return analysis_results
-        
-        print(f"[v0] Average sun exposure: {avg_sun:.1%}")
-        print(f"[v0] Wet locations: {wet_count}/{len(analysis_results)}")
+    city = stats["city"]
+    if city["cameras"]:
+        print(f"[v0] Average sun exposure: {city['sun_exposure']['mean']:.1%}")
+        print(f"[v0] Average wetness: {city['wetness']['mean']:.1%}")
+        print(f"[v0] Wet locations: {city['wet_locations']}/{city['cameras']}")
     
     return analysis_results
 
@@ -162,17 +249,46 @@ async def continuous_pipeline(interval_seconds: int = 300):
     Args:
         interval_seconds: Time between pipeline runs (default: 5 minutes)
     """
+    global result_writer
     print(f"[v0] Starting continuous pipeline (interval: {interval_seconds}s)")
     
-    while True:
-        print(f"\n{'='*60}")
-        print(f"[v0] Pipeline cycle starting at {datetime.now()}")
-        print(f"{'='*60}")
-        
-        await process_pipeline()
-        
-        print(f"\n[v0] Waiting {interval_seconds} seconds until next cycle...")
-        await asyncio.sleep(interval_seconds)
+    result_writer = create_writer()
+    archive = None
+    if not DEMO_MODE and synthetic_city is None:
+        # Keep the fetched image archive within its size and age budgets
+        from fetch_webcam_images import archive
+        archive.start_maintenance()
+    
+    try:
+        while True:
+            print(f"\n{'='*60}")
+            print(f"[v0] Pipeline cycle starting at {datetime.now()}")
+            print(f"{'='*60}")
+            
+            # Cycles start every interval_seconds: the cycle's own work is
+            # bounded by the interval and only the remainder is slept
+            cycle_started = time.monotonic()
+            await process_pipeline(deadline_seconds=interval_seconds)
+            print(f"[v0] Writer stats: {result_writer.stats()}")
+            
+            remaining = max(0.0, interval_seconds - (time.monotonic() - cycle_started))
+            print(f"\n[v0] Waiting {remaining:.0f} seconds until next cycle...")
+            await asyncio.sleep(remaining)
+    finally:
+        if archive is not None:
+            archive.stop_maintenance()
+        await result_writer.close()
+
+async def single_pipeline():
+    """
+    Run one pipeline cycle and wait for its results to be persisted.
+    """
+    global result_writer
+    result_writer = create_writer()
+    try:
+        return await process_pipeline()
+    finally:
+        await result_writer.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Urban Micro-Climate Pipeline")
@@ -180,6 +296,10 @@ if __name__ == "__main__":
                        help="Run continuously with specified interval in seconds")
     parser.add_argument("--production", action="store_true",
                        help="Run in production mode with real webcams (requires webcam URLs)")
+    parser.add_argument("--viewport", metavar="SOUTH,WEST,NORTH,EAST",
+                       help="Prioritize analysis of cameras inside this map area")
+    parser.add_argument("--synthetic", type=int, metavar="CAMERAS",
+                       help="Generate data for a synthetic city with this many cameras (load testing)")
     
     args = parser.parse_args()
     
@@ -190,6 +310,14 @@ if __name__ == "__main__":
     else:
         print("[v0] Running in DEMO MODE")
     
+    if args.viewport:
+        admission.set_viewport(*(float(v) for v in args.viewport.split(",")))
+    
+    if args.synthetic:
+        from synthetic_city import SyntheticCity
+        synthetic_city = SyntheticCity(num_cameras=args.synthetic)
+        print(f"[v0] Using synthetic city with {args.synthetic} cameras")
+    
     if args.continuous:
         # Run continuous pipeline
         print(f"[v0] Starting continuous mode with {args.continuous}s interval...")
@@ -197,4 +325,4 @@ if __name__ == "__main__":
     else:
         # Run a single pipeline cycle
         print("[v0] Running single pipeline cycle...")
-        asyncio.run(process_pipeline())
+        asyncio.run(single_pipeline())
@@ -0,0 +1,255 @@
+"""
+Backfill / Reprocessing Engine
+Re-scores archived frames with the current CV algorithms. Progress is
+checkpointed so an interrupted run resumes where it stopped, workers run at
+low priority behind a rate limit so the live pipeline is not starved, and
+results go into the score history tagged with the algorithm version.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+from cv_analysis import ALGORITHM_VERSION
+from image_archive import DEFAULT_ROOT, ImageArchive
+from score_history import HISTORY_PATH, ScoreHistory
+
+CHECKPOINT_DIR = Path("data/reprocess")
+
+_worker_archive: Optional[ImageArchive] = None
+
+
+def _init_worker(archive_root: str, niceness: int):
+    global _worker_archive
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+    _worker_archive = ImageArchive(archive_root, max_bytes=None, max_age_days=None, compact_after_days=None)
+
+
+def _score_frame(frame_id: int) -> Dict:
+    # Same segmented analysis (in full-quality mode) as the live pipeline, so
+    # backfilled rows are comparable with the ones it records. Ground masks
+    # are only read here; learning them is left to the live pipeline.
+    from cv_analysis import analyze_image_segmented
+
+    # Archive maintenance may have compacted (moved into a bundle) or
+    # evicted the frame since the job listed it
+    frame = _worker_archive.get(frame_id)
+    if frame is None:
+        raise FileNotFoundError(f"frame {frame_id} is no longer in the archive")
+    with _worker_archive.local_path(frame) as path:
+        analysis = analyze_image_segmented(path, frame["camera_id"], learn=False, advanced=True)
+    if "error" in analysis:
+        # Never overwrite a stored score with the zeros of a failed read
+        raise ValueError(analysis["error"])
+    return {
+        "camera_id": frame["camera_id"],
+        "captured_at": frame["captured_at"],
+        "algorithm_version": ALGORITHM_VERSION,
+        "sun_exposure": analysis["sun_exposure"],
+        "wetness": analysis["wetness"],
+        "wetness_advanced": analysis["wetness_advanced"],
+        "wetness_confidence": analysis["wetness_confidence"],
+        "analysis_mode": "normal",
+        "ground_fraction": analysis["ground_fraction"],
+        "mask_id": analysis["mask_id"],
+        "computed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+class ReprocessJob:
+    """
+    Resumable reprocessing of archived frames.
+
+    Frames are read from the archive index in capture order. The checkpoint
+    records the last frame below which everything has been written, so
+    frames finished out of order by parallel workers are never skipped; on
+    resume a few frames may be re-scored, which the history upsert absorbs.
+    Frames that fail to score are kept in the checkpoint by id and can be
+    retried with run(retry_failed=True).
+    """
+
+    def __init__(
+        self,
+        archive_root: str = str(DEFAULT_ROOT),
+        history_path: Path = HISTORY_PATH,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        workers: int = 2,
+        max_frames_per_second: Optional[float] = 10.0,
+        niceness: int = 10,
+        checkpoint_path: Optional[Path] = None,
+        commit_every: int = 50,
+    ):
+        """
+        Args:
+            archive_root: Image archive root directory
+            history_path: Score history database
+            since: Only frames captured at or after this time
+            until: Only frames captured before this time
+            workers: Worker processes
+            max_frames_per_second: Throttle (None for unthrottled)
+            niceness: Added to worker process niceness
+            checkpoint_path: Checkpoint file (defaults to one per algorithm version)
+            commit_every: Scores buffered before a history write and checkpoint
+        """
+        self.archive_root = archive_root
+        self.history = ScoreHistory(history_path)
+        self.since = since
+        self.until = until
+        self.workers = workers
+        self.max_frames_per_second = max_frames_per_second
+        self.niceness = niceness
+        self.checkpoint_path = Path(checkpoint_path or CHECKPOINT_DIR / f"checkpoint_{ALGORITHM_VERSION}.json")
+        self.commit_every = commit_every
+
+    def load_checkpoint(self) -> Dict:
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("algorithm_version") == ALGORITHM_VERSION:
+                # Checkpoints written before failed ids were kept only
+                # have a failure count
+                checkpoint.pop("failed", None)
+                checkpoint.setdefault("failed_ids", [])
+                return checkpoint
+        except FileNotFoundError:
+            pass
+        return {"algorithm_version": ALGORITHM_VERSION, "position": None, "processed": 0, "failed_ids": []}
+
+    def save_checkpoint(self, checkpoint: Dict):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    def run(self, retry_failed: bool = False) -> Dict:
+        """
+        Run (or resume) the job to completion.
+
+        Args:
+            retry_failed: Re-score only the frames recorded as failed in the
+                checkpoint (those evicted since are dropped) and leave the
+                resume position alone
+
+        Returns:
+            Final checkpoint dictionary
+        """
+        checkpoint = self.load_checkpoint()
+        position = tuple(checkpoint["position"]) if checkpoint["position"] else None
+        failed = set(checkpoint["failed_ids"])
+
+        archive = ImageArchive(self.archive_root, max_bytes=None, max_age_days=None, compact_after_days=None)
+        if retry_failed:
+            frames = [f for f in map(archive.get, sorted(failed)) if f is not None]
+            if len(frames) < len(failed):
+                print(f"[v0] {len(failed) - len(frames)} failed frames have been evicted; dropping them")
+            failed = {f["id"] for f in frames}
+        else:
+            frames = [
+                f for f in archive.iter_frames(since=self.since, until=self.until)
+                if position is None or (f["captured_at"], f["id"]) > position
+            ]
+        archive.close()
+        total = len(frames)
+        if retry_failed:
+            print(f"[v0] Retrying {total} failed frames with algorithm {ALGORITHM_VERSION}")
+        else:
+            print(f"[v0] Reprocessing {total} frames with algorithm {ALGORITHM_VERSION}"
+                  + (f" (resuming after {position[0]})" if position else ""))
+
+        interval = 1.0 / self.max_frames_per_second if self.max_frames_per_second else 0.0
+        pending = {}
+        done: Dict[int, Optional[Dict]] = {}
+        buffer = []
+        next_index = 0  # frames[:next_index] are all written
+        start = time.monotonic()
+        last_submit = 0.0
+
+        def commit():
+            nonlocal next_index
+            while next_index < total and next_index in done:
+                result = done.pop(next_index)
+                if result is None:
+                    failed.add(frames[next_index]["id"])
+                else:
+                    buffer.append(result)
+                    failed.discard(frames[next_index]["id"])
+                next_index += 1
+            if buffer:
+                self.history.record(buffer)
+                buffer.clear()
+            if next_index and not retry_failed:
+                last = frames[next_index - 1]
+                checkpoint["position"] = [last["captured_at"], last["id"]]
+            checkpoint["failed_ids"] = sorted(failed)
+            self.save_checkpoint(checkpoint)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.archive_root, self.niceness)) as pool:
+            submitted = 0
+            while submitted < total or pending:
+                # Keep a small queue per worker, paced by the throttle
+                while submitted < total and len(pending) < self.workers * 2:
+                    wait_for = last_submit + interval - time.monotonic()
+                    if wait_for > 0:
+                        time.sleep(wait_for)
+                    last_submit = time.monotonic()
+                    pending[pool.submit(_score_frame, frames[submitted]["id"])] = submitted
+                    submitted += 1
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = pending.pop(future)
+                    try:
+                        done[index] = future.result()
+                        checkpoint["processed"] += 1
+                    except Exception as e:
+                        print(f"[v0] Failed to reprocess {frames[index]['path']}: {str(e)}")
+                        done[index] = None
+
+                if len(done) >= self.commit_every:
+                    commit()
+                    elapsed = time.monotonic() - start
+                    rate = next_index / elapsed if elapsed else 0.0
+                    eta = (total - next_index) / rate if rate else 0.0
+                    print(f"[v0] Reprocess progress: {next_index}/{total} "
+                          f"({rate:.1f} frames/s, ETA {eta:.0f}s)")
+
+        commit()
+        checkpoint["completed_at"] = datetime.now(timezone.utc).isoformat()
+        self.save_checkpoint(checkpoint)
+        print(f"[v0] Reprocessing complete: {checkpoint['processed']} scored, "
+              f"{len(checkpoint['failed_ids'])} failed")
+        return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score archived frames with the current CV algorithms")
+    parser.add_argument("--archive", default=str(DEFAULT_ROOT), help="Image archive root")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Start of capture time range (ISO)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="End of capture time range (ISO)")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument("--rate", type=float, default=10.0, help="Max frames per second (0 for unthrottled)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Only re-score frames the checkpoint records as failed")
+    args = parser.parse_args()
+
+    job = ReprocessJob(
+        archive_root=args.archive,
+        since=args.since,
+        until=args.until,
+        workers=args.workers,
+        max_frames_per_second=args.rate or None,
+    )
+    if args.restart and job.checkpoint_path.exists():
+        job.checkpoint_path.unlink()
+    job.run(retry_failed=args.retry_failed)
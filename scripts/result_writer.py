@@ -0,0 +1,232 @@
+"""
+Async Result Writer
+Moves result persistence off the event loop. Results are queued by the
+pipeline and group-committed by a background task on a dedicated writer
+thread: one results file, one Redis pipeline and one score-history
+transaction per batch. A bounded queue applies backpressure when the writer
+falls behind.
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class LoopStallMonitor:
+    """
+    Measures event-loop stalls: how late a periodic wake-up fires beyond
+    its scheduled sleep is time the loop spent blocked.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.max_stall = 0.0
+        self.total_stall = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            stall = max(0.0, loop.time() - start - self.interval)
+            self.max_stall = max(self.max_stall, stall)
+            self.total_stall += stall
+            self.samples += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "max_stall_ms": round(self.max_stall * 1000, 2),
+            "total_stall_ms": round(self.total_stall * 1000, 2),
+            "samples": self.samples,
+        }
+
+
+class ResultWriter:
+    """
+    Batched, non-blocking persistence for analysis results.
+
+    `submit` only enqueues. The writer task collects queued batches until
+    `max_batch` results are pending or `flush_interval` seconds pass, then
+    writes them in one group commit on the writer thread. When the queue
+    holds `max_pending` batches, `submit` waits (backpressure) instead of
+    letting memory grow without bound.
+    """
+
+    def __init__(self, results_dir: Path, cache=None, history=None, max_batch: int = 1000,
+                 flush_interval: float = 1.0, max_pending: int = 100):
+        """
+        Args:
+            results_dir: Directory for analysis_*.json files
+            cache: Optional ClimateCache to update per batch
+            history: Optional ScoreHistory receiving every result that carries
+                a captured_at and algorithm_version
+            max_batch: Results that trigger an immediate flush
+            flush_interval: Maximum seconds a result waits before being flushed
+            max_pending: Queued submissions before submit() blocks
+        """
+        self.results_dir = Path(results_dir)
+        self.cache = cache
+        self.history = history
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-writer")
+        self.stall_monitor = LoopStallMonitor()
+        self.metrics = {
+            "batches": 0,
+            "results": 0,
+            "logical_bytes": 0,
+            "disk_bytes": 0,
+            "cache_bytes": 0,
+            "backpressure_wait_s": 0.0,
+            "flush_time_s": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            self.stall_monitor.start()
+
+    async def submit(self, results: List[Dict], extra: Optional[Dict] = None):
+        """
+        Queue results for persistence.
+
+        Args:
+            results: Analysis result dictionaries
+            extra: Top-level fields for the results file (e.g. mode, city_stats);
+                the most recent value wins when batches are merged
+        """
+        self._ensure_started()
+        start = time.perf_counter()
+        await self._queue.put((results, extra or {}))
+        self.metrics["backpressure_wait_s"] += time.perf_counter() - start
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            results, extra = list(item[0]), dict(item[1])
+            deadline = loop.time() + self.flush_interval
+
+            # Gather more submissions until the batch is full or the deadline passes
+            while len(results) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                results.extend(item[0])
+                extra.update(item[1])
+
+            try:
+                await loop.run_in_executor(self._executor, self._commit, results, extra)
+            except Exception as e:
+                print(f"[v0] Error persisting results: {str(e)}")
+
+    def _next_path(self) -> Path:
+        stem = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        path = self.results_dir / f"{stem}.json"
+        n = 1
+        while path.exists():
+            path = self.results_dir / f"{stem}_{n}.json"
+            n += 1
+        return path
+
+    def _commit(self, results: List[Dict], extra: Dict):
+        # Runs on the writer thread
+        start = time.perf_counter()
+        results_json = json.dumps(results)
+        output_data = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "results": results,
+            "total_analyzed": len(results),
+            **extra,
+        }
+        body = json.dumps(output_data).encode("utf-8")
+
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        path = self._next_path()
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+        cache_bytes = 0
+        if self.cache is not None:
+            cache_bytes = self.cache.set_many_webcam_data(
+                {r["webcam_id"]: r for r in results if "webcam_id" in r}
+            )
+            if "city_stats" in extra:
+                stats = extra["city_stats"]
+                self.cache.set_city_stats(stats["city"], districts=stats["districts"])
+
+        if self.history is not None:
+            self.history.record(
+                {
+                    "camera_id": r["webcam_id"],
+                    "captured_at": r["captured_at"],
+                    "algorithm_version": r["algorithm_version"],
+                    "sun_exposure": r.get("sun_exposure"),
+                    "wetness": r.get("wetness"),
+                    "wetness_advanced": r.get("wetness_advanced"),
+                    "wetness_confidence": r.get("wetness_confidence"),
+                    "analysis_mode": r.get("analysis_mode"),
+                    "ground_fraction": r.get("ground_fraction"),
+                    "mask_id": r.get("mask_id"),
+                    "computed_at": r.get("analysis_timestamp"),
+                }
+                for r in results if "captured_at" in r and "algorithm_version" in r
+            )
+
+        self.metrics["batches"] += 1
+        self.metrics["results"] += len(results)
+        self.metrics["logical_bytes"] += len(results_json)
+        self.metrics["disk_bytes"] += len(body)
+        self.metrics["cache_bytes"] += cache_bytes
+        self.metrics["flush_time_s"] += time.perf_counter() - start
+        print(f"[v0] Persisted {len(results)} results to {path}")
+
+    def stats(self) -> Dict:
+        """Writer metrics, including write amplification and loop stalls."""
+        m = dict(self.metrics)
+        written = m["disk_bytes"] + m["cache_bytes"]
+        m["write_amplification"] = round(written / m["logical_bytes"], 3) if m["logical_bytes"] else 0.0
+        m["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        m.update(self.stall_monitor.stats())
+        return m
+
+    async def close(self):
+        """Flush everything queued and stop the writer."""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        self.stall_monitor.stop()
+        self._executor.shutdown(wait=True)
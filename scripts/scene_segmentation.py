@@ -0,0 +1,218 @@
+"""
+Scene Segmentation Stage
+Learns each camera's static ground-plane mask from a rolling median of
+recent frames so sun/wetness analysis can skip sky and building facades.
+Masks are cached (in memory and as PNGs) and only recomputed occasionally;
+analysis works on the band of rows the ground covers, with the mask passed
+to OpenCV's masked counting/histogram routines.
+"""
+
+import threading
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+MASKS_DIR = Path("data/scene_masks")
+
+# Frames are downscaled to this width for median/segmentation work
+WORK_WIDTH = 160
+
+
+class SceneModel:
+    """Cached segmentation for one camera."""
+
+    def __init__(self, mask: np.ndarray, frames_seen: int = 0):
+        self.mask = mask  # uint8 ground mask at WORK_WIDTH resolution
+        self.frames_seen = frames_seen
+        self._mask_id: Optional[str] = None
+        self._bands: Dict[Tuple[int, int], Tuple[int, int, np.ndarray]] = {}
+
+    def ground_fraction(self) -> float:
+        return float(np.count_nonzero(self.mask)) / self.mask.size
+
+    def mask_id(self) -> str:
+        """Short checksum of the mask, identifying which mask produced a score."""
+        if self._mask_id is None:
+            shape_crc = zlib.crc32(str(self.mask.shape).encode())
+            self._mask_id = f"{zlib.crc32(self.mask.tobytes(), shape_crc):08x}"
+        return self._mask_id
+
+    def band(self, shape: Tuple[int, int]) -> Tuple[int, int, np.ndarray]:
+        """
+        Ground rows and mask for a full-resolution frame shape.
+
+        Returns:
+            (top, bottom, mask) where mask is the uint8 ground mask of rows
+            top:bottom; cached per shape
+        """
+        band = self._bands.get(shape)
+        if band is None:
+            height, width = shape
+            full = cv2.resize(self.mask, (width, height), interpolation=cv2.INTER_NEAREST)
+            rows = np.flatnonzero(full.any(axis=1))
+            top, bottom = (int(rows[0]), int(rows[-1]) + 1) if rows.size else (0, 0)
+            band = self._bands[shape] = (top, bottom, np.ascontiguousarray(full[top:bottom]))
+        return band
+
+
+def segment_ground(median: np.ndarray) -> np.ndarray:
+    """
+    Ground-plane mask from a median background frame.
+
+    1. Sky: bright, smooth pixels connected to the top edge of the frame
+    2. Facades: above-ground regions dense in vertical edges
+    3. Ground: everything below the sky line that is not a facade
+
+    Args:
+        median: BGR median frame (downscaled)
+
+    Returns:
+        uint8 mask, 255 for ground pixels
+    """
+    height, width = median.shape[:2]
+    gray = cv2.cvtColor(median, cv2.COLOR_BGR2GRAY)
+    hsv = cv2.cvtColor(median, cv2.COLOR_BGR2HSV)
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    gradient = cv2.blur(cv2.magnitude(gx, gy), (5, 5))
+
+    # Sky candidates: bright and smooth, bluish or washed out
+    hue, saturation, value = cv2.split(hsv)
+    bright = value > 140
+    smooth = gradient < 40
+    skyish = ((hue > 90) & (hue < 135)) | (saturation < 40)
+    candidates = (bright & smooth & skyish).astype(np.uint8)
+    _, labels = cv2.connectedComponents(candidates)
+    top_labels = np.unique(labels[0][candidates[0] > 0])
+    sky = np.isin(labels, top_labels[top_labels > 0])
+
+    # Sky line: below the lowest sky pixel in each column
+    rows = np.arange(height)[:, None]
+    sky_rows = np.where(sky, rows, -1)
+    sky_line = sky_rows.max(axis=0)
+    below_sky = rows > sky_line[None, :]
+
+    # Facades: dense vertical edges in the upper part of the frame
+    vertical = cv2.blur(np.abs(gx), (9, 9))
+    horizon = int(np.median(np.maximum(sky_line, 0))) if sky.any() else 0
+    facade = (vertical > 2 * np.abs(gy).mean() + 20) & (rows < max(horizon, height // 3) + height // 4)
+
+    ground = (below_sky & ~facade).astype(np.uint8) * 255
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+    ground = cv2.morphologyEx(ground, cv2.MORPH_OPEN, kernel)
+    ground = cv2.morphologyEx(ground, cv2.MORPH_CLOSE, kernel)
+    return ground
+
+
+class SceneSegmenter:
+    """
+    Per-camera ground masks learned from a rolling median.
+
+    Every `sample_every`-th frame of a camera is added (downscaled) to a
+    ring buffer of `history` frames. The mask is recomputed from the median
+    of that buffer once every `refresh_every` frames; in between, cached
+    masks are reused as-is.
+    """
+
+    def __init__(self, history: int = 15, sample_every: int = 1, refresh_every: int = 100,
+                 min_frames: int = 5, masks_dir: Optional[Path] = MASKS_DIR,
+                 min_ground_fraction: float = 0.05):
+        """
+        Args:
+            history: Frames kept for the rolling median
+            sample_every: Keep every N-th frame in the history
+            refresh_every: Frames between mask recomputations
+            min_frames: Frames needed before a first mask is learned
+            masks_dir: Where masks are persisted (None to keep them in memory only)
+            min_ground_fraction: Masks covering less than this are discarded
+        """
+        self.history = history
+        self.sample_every = sample_every
+        self.refresh_every = refresh_every
+        self.min_frames = min_frames
+        self.masks_dir = Path(masks_dir) if masks_dir else None
+        self.min_ground_fraction = min_ground_fraction
+        self._frames: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._models: Dict[str, Optional[SceneModel]] = {}
+        self._last_attempt: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, camera_id: str) -> Optional[SceneModel]:
+        if self.masks_dir is None:
+            return None
+        path = self.masks_dir / f"{camera_id}.png"
+        mask = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE) if path.exists() else None
+        return SceneModel(mask) if mask is not None else None
+
+    def _save(self, camera_id: str, model: SceneModel):
+        if self.masks_dir is None:
+            return
+        self.masks_dir.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(str(self.masks_dir / f"{camera_id}.png"), model.mask)
+
+    def model(self, camera_id: str) -> Optional[SceneModel]:
+        """Cached scene model for a camera, loading a persisted mask if needed."""
+        if camera_id not in self._models:
+            with self._lock:
+                if camera_id not in self._models:
+                    self._models[camera_id] = self._load(camera_id)
+        return self._models[camera_id]
+
+    def observe(self, camera_id: str, img: np.ndarray) -> Optional[SceneModel]:
+        """
+        Feed a frame and return the camera's current scene model.
+
+        Args:
+            camera_id: Webcam identifier
+            img: BGR frame
+
+        Returns:
+            SceneModel, or None while there are too few frames to learn one
+        """
+        model = self.model(camera_id)
+        count = self._counts.get(camera_id, 0) + 1
+        self._counts[camera_id] = count
+
+        if count % self.sample_every == 0:
+            height, width = img.shape[:2]
+            work_height = max(1, round(height * WORK_WIDTH / width))
+            small = cv2.resize(img, (WORK_WIDTH, work_height), interpolation=cv2.INTER_AREA)
+            frames = self._frames.setdefault(camera_id, deque(maxlen=self.history))
+            if frames and frames[0].shape != small.shape:
+                frames.clear()  # camera resolution changed
+            frames.append(small)
+
+        frames = self._frames.get(camera_id, ())
+        # Without a usable mask, retry every min_frames frames rather than
+        # re-running the median on every frame
+        since_attempt = count - self._last_attempt.get(camera_id, 0)
+        due = since_attempt >= (self.min_frames if model is None else self.refresh_every)
+        if due and len(frames) >= self.min_frames:
+            self._last_attempt[camera_id] = count
+            model = self.refresh(camera_id) or model
+        return model
+
+    def refresh(self, camera_id: str) -> Optional[SceneModel]:
+        """Recompute a camera's mask from its frame history."""
+        frames = self._frames.get(camera_id)
+        if not frames:
+            return None
+        median = np.median(np.stack(frames), axis=0).astype(np.uint8)
+        mask = segment_ground(median)
+        model = SceneModel(mask, frames_seen=self._counts.get(camera_id, 0))
+        if model.ground_fraction() < self.min_ground_fraction:
+            print(f"[v0] Scene mask for {camera_id} rejected ({model.ground_fraction():.1%} ground)")
+            return None
+        with self._lock:
+            self._models[camera_id] = model
+        self._save(camera_id, model)
+        print(f"[v0] Scene mask for {camera_id} refreshed: {model.ground_fraction():.1%} ground")
+        return model
+
+
+scene_segmenter = SceneSegmenter()
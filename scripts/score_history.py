@@ -0,0 +1,117 @@
+"""
+Score History
+Time-series store of per-frame analysis scores, keyed by camera, capture
+time and algorithm version so re-scored frames sit next to the originals.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+HISTORY_PATH = Path("data/score_history.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    camera_id TEXT NOT NULL,
+    captured_at TEXT NOT NULL,
+    algorithm_version TEXT NOT NULL,
+    sun_exposure REAL,
+    wetness REAL,
+    wetness_advanced REAL,
+    wetness_confidence REAL,
+    analysis_mode TEXT,
+    ground_fraction REAL,
+    mask_id TEXT,
+    computed_at TEXT NOT NULL,
+    PRIMARY KEY (camera_id, captured_at, algorithm_version)
+);
+"""
+
+# wetness is the basic score (the wet indicators shown on the map);
+# wetness_advanced/wetness_confidence are the advanced_cv_analysis scores over
+# the same ground pixels and are NULL when the live pipeline skipped them
+# under load. ground_fraction/mask_id identify the scene mask the scores were
+# computed over; mask_id is NULL for the full-frame fallback used before a
+# camera's mask is learned, so rows of one algorithm version that were scored
+# over different pixels can be told apart
+_COLUMNS = ("camera_id", "captured_at", "algorithm_version", "sun_exposure",
+            "wetness", "wetness_advanced", "wetness_confidence", "analysis_mode",
+            "ground_fraction", "mask_id", "computed_at")
+
+# Columns added after the first release, for existing databases
+_ADDED_COLUMNS = {"wetness_advanced": "REAL", "analysis_mode": "TEXT",
+                  "ground_fraction": "REAL", "mask_id": "TEXT"}
+
+
+class ScoreHistory:
+    """SQLite-backed score history; writes are idempotent upserts."""
+
+    def __init__(self, path: Path = HISTORY_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(scores)")}
+        with self._db:
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE scores ADD COLUMN {column} {kind}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def record(self, rows: Iterable[Dict]) -> int:
+        """
+        Insert or replace scores.
+
+        Args:
+            rows: Dictionaries with the score columns
+
+        Returns:
+            Number of rows written
+        """
+        values = [tuple(row.get(col) for col in _COLUMNS) for row in rows]
+        with self._lock, self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO scores ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in _COLUMNS)})",
+                values,
+            )
+        return len(values)
+
+    def versions(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute(
+                "SELECT DISTINCT algorithm_version FROM scores ORDER BY algorithm_version"
+            )]
+
+    def compare(self, version_a: str, version_b: str, camera_id: Optional[str] = None) -> List[Dict]:
+        """
+        Side-by-side scores for frames scored by both algorithm versions.
+
+        Returns:
+            Rows with camera_id, captured_at and sun/wetness/analysis mode/
+            mask id for each version
+        """
+        query = (
+            "SELECT a.camera_id, a.captured_at, "
+            "a.sun_exposure AS sun_a, b.sun_exposure AS sun_b, "
+            "a.wetness AS wetness_a, b.wetness AS wetness_b, "
+            "a.wetness_advanced AS wetness_advanced_a, b.wetness_advanced AS wetness_advanced_b, "
+            "a.analysis_mode AS mode_a, b.analysis_mode AS mode_b, "
+            "a.mask_id AS mask_a, b.mask_id AS mask_b "
+            "FROM scores a JOIN scores b "
+            "ON a.camera_id = b.camera_id AND a.captured_at = b.captured_at "
+            "WHERE a.algorithm_version = ? AND b.algorithm_version = ?"
+        )
+        params = [version_a, version_b]
+        if camera_id is not None:
+            query += " AND a.camera_id = ?"
+            params.append(camera_id)
+        query += " ORDER BY a.captured_at"
+        with self._lock:
+            return [dict(r) for r in self._db.execute(query, params)]
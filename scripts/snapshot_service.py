@@ -0,0 +1,218 @@
+"""
+Latest-Conditions Snapshot Service
+Keeps one precomputed, pre-serialized city snapshot in memory and serves it
+with stale-while-revalidate semantics and ETag-based conditional responses.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+RESULTS_DIR = Path("data/analysis_results")
+
+
+class Snapshot:
+    """An immutable, already-serialized view of the latest city conditions."""
+
+    __slots__ = ("version", "etag", "body", "built_at", "headers")
+
+    def __init__(self, version: int, body: bytes, built_at: float):
+        self.version = version
+        self.body = body
+        self.built_at = built_at
+        self.etag = f'"{version}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self.headers = {
+            "ETag": self.etag,
+            "X-Snapshot-Version": str(version),
+            "Content-Type": "application/json",
+        }
+
+
+class SnapshotService:
+    """
+    Serves the latest snapshot from memory without touching disk or Redis.
+
+    Reads never block on the upstream loader: once the snapshot is older
+    than `fresh_seconds`, the caller still gets it immediately while a single
+    background refresh runs. If the loader fails or has no data (e.g. Redis
+    entries expired), the previous snapshot keeps being served and is marked
+    stale instead of disappearing, and the loader is not called again for
+    `retry_seconds` so a struggling upstream is not hammered by reads.
+    """
+
+    def __init__(self, loader: Callable[[], Optional[Dict]], fresh_seconds: float = 10.0,
+                 max_stale_seconds: Optional[float] = None, retry_seconds: Optional[float] = None):
+        """
+        Args:
+            loader: Callable returning the latest data dict (or None if unavailable)
+            fresh_seconds: Age after which a background refresh is triggered
+            max_stale_seconds: Age after which a read waits for a refresh
+                instead of serving stale data (None to always serve stale)
+            retry_seconds: Minimum time between loader calls after one that
+                produced no data (defaults to fresh_seconds)
+        """
+        self.loader = loader
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.retry_seconds = fresh_seconds if retry_seconds is None else retry_seconds
+        self._failed_at: Optional[float] = None
+        self._snapshot: Optional[Snapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._version = 0
+        self.last_error: Optional[str] = None
+
+    def refresh(self) -> Optional[Snapshot]:
+        """
+        Load upstream data and publish a new snapshot if it changed.
+
+        Returns:
+            The current snapshot after the refresh
+        """
+        try:
+            data = self.loader()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[v0] Snapshot refresh failed: {str(e)}")
+            data = None
+
+        current = self._snapshot
+        now = time.monotonic()
+        if data is None:
+            self._failed_at = now
+            return current
+
+        self._failed_at = None
+        self.last_error = None
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        if current is not None and current.body == body:
+            # Same content: keep the version/ETag, just mark it fresh again
+            current.built_at = now
+            return current
+
+        self._version += 1
+        # Publishing is a single reference swap, so readers need no lock
+        self._snapshot = Snapshot(self._version, body, now)
+        return self._snapshot
+
+    def _backing_off(self) -> bool:
+        failed_at = self._failed_at
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_seconds
+
+    def _refresh_in_background(self):
+        if self._backing_off():
+            return  # The last attempt failed recently
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # A refresh is already running
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self) -> Tuple[Optional[Snapshot], bool]:
+        """
+        Current snapshot and whether it is stale.
+
+        Returns:
+            (snapshot, is_stale); snapshot is None only before the first load
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            if self._backing_off():
+                return None, False
+            with self._refresh_lock:
+                snapshot = self._snapshot or self.refresh()
+            return snapshot, False
+
+        age = time.monotonic() - snapshot.built_at
+        if age <= self.fresh_seconds:
+            return snapshot, False
+        if self.max_stale_seconds is not None and age > self.max_stale_seconds and not self._backing_off():
+            with self._refresh_lock:
+                snapshot = self.refresh()
+            return snapshot, time.monotonic() - snapshot.built_at > self.fresh_seconds
+        self._refresh_in_background()
+        return snapshot, True
+
+    def respond(self, if_none_match: Optional[str] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Build an HTTP response for a (possibly conditional) GET.
+
+        Args:
+            if_none_match: Value of the request's If-None-Match header
+
+        Returns:
+            (status code, headers, body)
+        """
+        snapshot, stale = self.get()
+        if snapshot is None:
+            return 503, {"Retry-After": "5"}, b'{"error":"No analysis data available"}'
+
+        headers = snapshot.headers
+        if stale:
+            headers = dict(headers, Warning='110 - "Response is Stale"')
+        if if_none_match and (if_none_match == "*" or snapshot.etag in if_none_match):
+            return 304, headers, b""
+        return 200, headers, snapshot.body
+
+
+def load_latest_results_file(results_dir: Path = RESULTS_DIR) -> Optional[Dict]:
+    """
+    Loader reading the newest analysis_*.json file.
+
+    Returns:
+        Parsed results, or None if there are none
+    """
+    try:
+        latest = max(
+            (e.name for e in os.scandir(results_dir) if e.name.endswith(".json")),
+            default=None,
+        )
+    except FileNotFoundError:
+        return None
+    if latest is None:
+        return None
+    with open(results_dir / latest) as f:
+        return json.load(f)
+
+
+def cache_loader(cache) -> Callable[[], Optional[Dict]]:
+    """
+    Loader reading all webcams from a ClimateCache.
+
+    Returns None when the cache is empty (e.g. every entry hit its TTL), so
+    the service keeps serving the last snapshot.
+    """
+    def load():
+        webcams = cache.get_all_webcams()
+        if not webcams:
+            return None
+        return {
+            "results": webcams,
+            "total_analyzed": len(webcams),
+            "city_stats": cache.get_city_stats(),
+        }
+    return load
+
+
+if __name__ == "__main__":
+    # Benchmark the read path on a single core
+    service = SnapshotService(lambda: {"results": [{"webcam_id": f"cam-{i}"} for i in range(1000)]})
+    etag = service.respond()[1]["ETag"]
+    reads = 200000
+    start = time.perf_counter()
+    for _ in range(reads):
+        service.respond()
+    full = reads / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(reads):
+        service.respond(etag)
+    conditional = reads / (time.perf_counter() - start)
+    print(f"[v0] Snapshot reads: {full:,.0f}/s (200), {conditional:,.0f}/s (304)")
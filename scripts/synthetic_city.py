@@ -0,0 +1,272 @@
+"""
+Synthetic City Load Generator
+Vectorized generator for N synthetic webcams (up to ~1M) with spatially and
+temporally correlated sun and wetness fields, a diurnal sun curve and moving
+rain fronts. Used to load-test the pipeline, cache and websocket at scale.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Default city: centered on Manhattan, 20km x 20km
+DEFAULT_CENTER = (40.7580, -73.9855)
+DEFAULT_EXTENT_KM = 20.0
+DEFAULT_TIMEZONE = "America/New_York"
+
+KM_PER_DEG_LAT = 110.57
+
+
+class SyntheticCity:
+    """
+    A city of synthetic cameras whose readings evolve over simulated time.
+
+    Cloud cover is a sum of slowly drifting low-frequency plane waves, so
+    nearby cameras see similar sky and readings change smoothly between
+    steps. Rain fronts are bands that sweep across the city, wet every
+    camera they pass over and come around again once they have left the
+    city; surfaces dry out exponentially in between.
+    """
+
+    def __init__(
+        self,
+        num_cameras: int = 1000,
+        center=DEFAULT_CENTER,
+        extent_km: float = DEFAULT_EXTENT_KM,
+        num_waves: int = 8,
+        rain_fronts: int = 1,
+        seed: Optional[int] = None,
+        start_time: Optional[datetime] = None,
+        tz: str = DEFAULT_TIMEZONE,
+    ):
+        """
+        Args:
+            num_cameras: Number of synthetic cameras
+            center: (lat, lng) of the city center
+            extent_km: Width/height of the square city area
+            num_waves: Plane waves summed for the cloud field
+            rain_fronts: Number of rain fronts crossing the city
+            seed: Random seed for reproducible cities
+            start_time: Simulated start time (defaults to now, UTC)
+            tz: IANA time zone of the city; the sun curve follows local time
+        """
+        self.rng = np.random.default_rng(seed)
+        self.num_cameras = num_cameras
+        self.center = center
+        self.extent_km = extent_km
+        self.sim_time = start_time or datetime.now(timezone.utc)
+        self.tz = ZoneInfo(tz)
+        self.elapsed_hours = 0.0
+
+        # Camera positions in local km coordinates and lat/lng
+        half = extent_km / 2
+        self.x = self.rng.uniform(-half, half, num_cameras).astype(np.float32)
+        self.y = self.rng.uniform(-half, half, num_cameras).astype(np.float32)
+        km_per_deg_lng = KM_PER_DEG_LAT * np.cos(np.radians(center[0]))
+        self.lat = center[0] + self.y / KM_PER_DEG_LAT
+        self.lng = center[1] + self.x / km_per_deg_lng
+
+        # Cloud field: plane waves with wavelengths between 1/4 and 1x the city
+        angles = self.rng.uniform(0, 2 * np.pi, num_waves)
+        wavenumbers = 2 * np.pi / (extent_km * self.rng.uniform(0.25, 1.0, num_waves))
+        self.kx = (wavenumbers * np.cos(angles)).astype(np.float32)
+        self.ky = (wavenumbers * np.sin(angles)).astype(np.float32)
+        self.phase = self.rng.uniform(0, 2 * np.pi, num_waves).astype(np.float32)
+        # Phase drift in radians per hour, i.e. clouds move across the city
+        self.drift = self.rng.uniform(0.5, 3.0, num_waves).astype(np.float32)
+        self.amplitude = (1.0 / np.arange(1, num_waves + 1)).astype(np.float32)
+        self.cloud_bias = float(self.rng.uniform(-0.3, 0.3))
+
+        # Rain fronts: direction, starting offset (km), speed (km/h), width (km).
+        # Positions wrap every front_period_km, so each front recurs after
+        # leaving the city (every 1.5-6 simulated hours at the default size)
+        self.front_period_km = 3 * extent_km
+        self.front_dir = self.rng.uniform(0, 2 * np.pi, rain_fronts)
+        self.front_pos = self.rng.uniform(-1.5 * extent_km, -0.5 * extent_km, rain_fronts)
+        self.front_speed = self.rng.uniform(10.0, 40.0, rain_fronts)
+        self.front_width = self.rng.uniform(1.0, 4.0, rain_fronts)
+        self.drying_hours = 1.5
+
+        self.wetness = np.zeros(num_cameras, dtype=np.float32)
+        self.sun_exposure = np.zeros(num_cameras, dtype=np.float32)
+        self.ids = np.char.add("syn-", np.arange(num_cameras).astype(str))
+        self.step(0.0)
+
+    def _diurnal(self) -> float:
+        """Sun strength from the simulated local hour: 0 at night, peaking at 1pm."""
+        local = self.sim_time.astimezone(self.tz)
+        hour = local.hour + local.minute / 60
+        return float(max(0.0, np.sin(np.pi * (hour - 6) / 14))) if 6 <= hour <= 20 else 0.0
+
+    def _cloud_cover(self, hours: float) -> np.ndarray:
+        field = np.zeros(self.num_cameras, dtype=np.float32)
+        for k in range(len(self.kx)):
+            field += self.amplitude[k] * np.cos(
+                self.kx[k] * self.x + self.ky[k] * self.y + self.phase[k] - self.drift[k] * hours
+            )
+        field /= self.amplitude.sum()
+        return np.clip(0.5 + field + self.cloud_bias, 0.0, 1.0)
+
+    def _rain(self, hours: float) -> np.ndarray:
+        rain = np.zeros(self.num_cameras, dtype=np.float32)
+        for i in range(len(self.front_dir)):
+            along = self.x * np.cos(self.front_dir[i]) + self.y * np.sin(self.front_dir[i])
+            travelled = self.front_pos[i] + self.front_speed[i] * hours
+            position = (travelled + 1.5 * self.extent_km) % self.front_period_km - 1.5 * self.extent_km
+            rain = np.maximum(rain, np.exp(-((along - position) / self.front_width[i]) ** 2))
+        return rain
+
+    def step(self, dt_seconds: float = 60.0):
+        """
+        Advance simulated time and recompute every camera's reading.
+
+        Args:
+            dt_seconds: Simulated seconds to advance
+        """
+        self.sim_time += timedelta(seconds=dt_seconds)
+        self.elapsed_hours += dt_seconds / 3600
+        hours = self.elapsed_hours
+
+        cloud = self._cloud_cover(hours)
+        rain = self._rain(hours)
+        noise = self.rng.normal(0, 0.03, self.num_cameras).astype(np.float32)
+        self.sun_exposure = np.clip(self._diurnal() * (1 - 0.8 * cloud) * (1 - rain) + noise, 0.01, 0.99)
+
+        dry = np.float32(np.exp(-dt_seconds / 3600 / self.drying_hours))
+        self.wetness = np.maximum(self.wetness * dry, rain * 0.95)
+
+    def results(self, indices: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Current readings in the pipeline result format (as generate_demo_data).
+
+        Args:
+            indices: Optional subset of camera indices
+
+        Returns:
+            List of result dictionaries
+        """
+        if indices is None:
+            indices = np.arange(self.num_cameras)
+        sun = np.round(self.sun_exposure[indices].astype(np.float64), 3)
+        wet = np.round(self.wetness[indices].astype(np.float64), 2)
+        timestamp = self.sim_time.isoformat()
+        comfort = np.where(sun > 0.7, "comfortable", np.where(sun > 0.4, "moderate", "low"))
+        rows = zip(
+            self.ids[indices].tolist(), self.lat[indices].tolist(), self.lng[indices].tolist(),
+            sun.tolist(), wet.tolist(), comfort.tolist(),
+        )
+        return [
+            {
+                "webcam_id": webcam_id,
+                "webcam_name": webcam_id,
+                "location": {"lat": round(lat, 6), "lng": round(lng, 6)},
+                "analysis": {
+                    "sun_exposure": s,
+                    "shadow_ratio": round(1 - s, 3),
+                    "brightness_avg": round(s * 200 + 55, 1),
+                    "wetness_detected": w > 0.5,
+                    "wetness_confidence": w,
+                    "comfort_level": c,
+                },
+                "timestamp": timestamp,
+                "status": "success",
+            }
+            for webcam_id, lat, lng, s, w, c in rows
+        ]
+
+    def websocket_updates(self, indices: Optional[np.ndarray] = None) -> List[Dict]:
+        """Current readings in the websocket analysis_update format."""
+        if indices is None:
+            indices = np.arange(self.num_cameras)
+        timestamp = self.sim_time.isoformat()
+        rows = zip(
+            self.ids[indices].tolist(),
+            np.round(self.sun_exposure[indices].astype(np.float64), 3).tolist(),
+            np.round(self.wetness[indices].astype(np.float64), 3).tolist(),
+        )
+        return [
+            {"webcamId": webcam_id, "sunExposure": s, "wetness": w, "timestamp": timestamp}
+            for webcam_id, s, w in rows
+        ]
+
+
+async def run_load(city: SyntheticCity, sink, updates_per_second: float,
+                   batch_size: int = 1000, duration_seconds: float = 10.0,
+                   sim_seconds_per_batch: float = 60.0) -> Dict:
+    """
+    Feed synthetic results to a sink at a target update rate.
+
+    Cameras are visited round-robin in batches; the city is stepped forward
+    once every camera has been sent.
+
+    Args:
+        city: Synthetic city to draw readings from
+        sink: Callable (sync or async) taking a list of result dictionaries
+        updates_per_second: Target camera updates per second
+        batch_size: Results per sink call
+        duration_seconds: Wall-clock duration of the run
+        sim_seconds_per_batch: Simulated time advanced per full sweep
+
+    Returns:
+        Dictionary with sent count and achieved rate
+    """
+    interval = batch_size / updates_per_second
+    start = time.perf_counter()
+    sent = 0
+    cursor = 0
+    while time.perf_counter() - start < duration_seconds:
+        batch_start = time.perf_counter()
+        end = min(cursor + batch_size, city.num_cameras)
+        result = sink(city.results(np.arange(cursor, end)))
+        if asyncio.iscoroutine(result):
+            await result
+        sent += end - cursor
+        cursor = end
+        if cursor >= city.num_cameras:
+            cursor = 0
+            city.step(sim_seconds_per_batch)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - batch_start)))
+    elapsed = time.perf_counter() - start
+    return {"sent": sent, "elapsed": round(elapsed, 2), "rate": round(sent / elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic city load generator")
+    parser.add_argument("--cameras", type=int, default=100000, help="Number of synthetic cameras")
+    parser.add_argument("--rate", type=float, default=50000, help="Target camera updates per second")
+    parser.add_argument("--batch", type=int, default=1000, help="Results per batch")
+    parser.add_argument("--duration", type=float, default=10.0, help="Run time in seconds")
+    parser.add_argument("--sink", choices=["stats", "cache", "none"], default="stats",
+                        help="Where to send results")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    city = SyntheticCity(num_cameras=args.cameras, seed=args.seed)
+    print(f"[v0] Built {args.cameras} cameras in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    city.step(60.0)
+    print(f"[v0] Field step: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    if args.sink == "stats":
+        from city_stats import CityStatsAggregator
+        sink = CityStatsAggregator().update_many
+    elif args.sink == "cache":
+        import sys
+        from pathlib import Path
+        sys.path.append(str(Path(__file__).resolve().parent.parent / "lib"))
+        from redis_cache import ClimateCache
+        cache = ClimateCache()
+        def sink(results):
+            cache.set_many_webcam_data({r["webcam_id"]: r for r in results})
+    else:
+        def sink(results):
+            pass
+
+    report = asyncio.run(run_load(city, sink, args.rate, args.batch, args.duration))
+    print(f"[v0] Sent {report['sent']} updates in {report['elapsed']}s ({report['rate']}/s)")
@@ -0,0 +1,19 @@
+"""
+Overload check for the admission controller.
+Drives a synthetic city far beyond one worker's capacity: viewport cameras
+must stay within the queue-latency SLO while the controller degrades and
+drops stale frames instead of falling behind.
+
+Run with: python -m pytest scripts/test_admission_control.py
+"""
+
+from admission_control import simulate_overload
+
+
+def test_overload_keeps_viewport_within_slo():
+    stats = simulate_overload()
+
+    assert stats["viewport_p95"] <= stats["slo_seconds"], "viewport cameras missed the latency SLO"
+    assert stats["levels"]["normal"] < stats["dispatched"], "controller never degraded under overload"
+    assert stats["superseded"] + stats["shed"] + stats["expired"] > 0, "no stale frames were dropped"
+    assert stats["queue_depth"] <= 2000, "queue grew beyond one frame per camera"
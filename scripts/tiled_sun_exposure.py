@@ -0,0 +1,185 @@
+"""
+Tiled Sun Exposure Engine
+Alternative to the full-frame GaussianBlur + adaptiveThreshold pass in
+cv_analysis.analyze_sun_exposure. Local means come from per-tile integral
+images, tiles run in parallel threads (OpenCV and large NumPy operations
+release the GIL), and the per-tile bright ratios double as a sun map.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BLOCK_SIZE = 11  # Matches the adaptiveThreshold block in cv_analysis
+THRESHOLD_C = 2
+BLUR_SIZE = 5
+TILE_SIZE = 256
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="sun-tile")
+    return _executor
+
+
+def _tile_bright_count(padded: np.ndarray, y0: int, y1: int, x0: int, x1: int,
+                       block: int, c: float) -> int:
+    """
+    Count bright pixels in tile [y0:y1, x0:x1] of the unpadded frame.
+
+    `padded` is the frame padded by blur radius + block radius on every
+    side, so each tile can read its halo without special-casing edges.
+    """
+    blur_r = BLUR_SIZE // 2
+    r = block // 2
+    halo = blur_r + r
+
+    # Blur the tile plus the halo the local mean needs; the blur's own halo
+    # is cropped away afterwards
+    region = padded[y0:y1 + 2 * halo, x0:x1 + 2 * halo]
+    blurred = cv2.GaussianBlur(region, (BLUR_SIZE, BLUR_SIZE), 0)[blur_r:-blur_r, blur_r:-blur_r]
+
+    # Box sums over block x block windows from the integral image
+    integral = cv2.integral(blurred, sdepth=cv2.CV_32S)
+    h, w = y1 - y0, x1 - x0
+    sums = (
+        integral[block:block + h, block:block + w]
+        - integral[0:h, block:block + w]
+        - integral[block:block + h, 0:w]
+        + integral[0:h, 0:w]
+    )
+    center = blurred[r:r + h, r:r + w].astype(np.int32)
+    # center > mean - c, kept in integers: center * area > sums - c * area
+    area = block * block
+    return int(np.count_nonzero(center * area > sums - int(c * area)))
+
+
+def sun_exposure_from_gray(gray: np.ndarray, block: int = BLOCK_SIZE, c: float = THRESHOLD_C,
+                           tile: int = TILE_SIZE, parallel: bool = True) -> Tuple[float, np.ndarray]:
+    """
+    Bright-pixel ratio of a grayscale frame using tiled local means.
+
+    Args:
+        gray: Grayscale uint8 image
+        block: Local mean window size (odd)
+        c: Constant subtracted from the local mean
+        tile: Tile edge length in pixels
+        parallel: Process tiles on the shared thread pool
+
+    Returns:
+        (sun exposure ratio, per-tile sun map as float32 array)
+    """
+    halo = BLUR_SIZE // 2 + block // 2
+    padded = cv2.copyMakeBorder(gray, halo, halo, halo, halo, cv2.BORDER_REPLICATE)
+    height, width = gray.shape[:2]
+    rows = list(range(0, height, tile))
+    cols = list(range(0, width, tile))
+    tiles = [
+        (i, j, y0, min(y0 + tile, height), x0, min(x0 + tile, width))
+        for i, y0 in enumerate(rows) for j, x0 in enumerate(cols)
+    ]
+
+    def run(t):
+        i, j, y0, y1, x0, x1 = t
+        return i, j, (y1 - y0) * (x1 - x0), _tile_bright_count(padded, y0, y1, x0, x1, block, c)
+
+    if parallel and len(tiles) > 1:
+        counts = list(_get_executor().map(run, tiles))
+    else:
+        counts = [run(t) for t in tiles]
+
+    sun_map = np.zeros((len(rows), len(cols)), dtype=np.float32)
+    bright_total = 0
+    for i, j, pixels, bright in counts:
+        sun_map[i, j] = bright / pixels
+        bright_total += bright
+    return bright_total / gray.size, sun_map
+
+
+def analyze_sun_exposure_tiled(image_path: str, tile: int = TILE_SIZE, scale: float = 1.0) -> Dict:
+    """
+    Analyze sun exposure with the tiled engine.
+
+    Args:
+        image_path: Path to the image file
+        tile: Tile edge length in pixels
+        scale: Analysis resolution relative to the original image
+
+    Returns:
+        Dictionary with sun_exposure and the per-tile sun_map (nested lists)
+    """
+    from cv_analysis import read_image
+
+    try:
+        img = read_image(image_path, scale)
+        if img is None:
+            print(f"[v0] Error: Could not read image {image_path}")
+            return {"sun_exposure": 0.0, "sun_map": []}
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        sun_exposure, sun_map = sun_exposure_from_gray(gray, tile=tile)
+        print(f"[v0] Tiled sun exposure analysis: {sun_exposure:.2%} bright pixels")
+        return {"sun_exposure": sun_exposure, "sun_map": np.round(sun_map, 3).tolist()}
+    except Exception as e:
+        print(f"[v0] Error analyzing sun exposure: {str(e)}")
+        return {"sun_exposure": 0.0, "sun_map": []}
+
+
+def _reference_sun_exposure(gray: np.ndarray) -> float:
+    # Same computation as cv_analysis.analyze_sun_exposure, minus the file read
+    blurred = cv2.GaussianBlur(gray, (BLUR_SIZE, BLUR_SIZE), 0)
+    binary = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                   cv2.THRESH_BINARY, BLOCK_SIZE, THRESHOLD_C)
+    return np.count_nonzero(binary == 255) / binary.size
+
+
+def benchmark(sizes=((720, 1280), (2160, 3840), (4320, 7680)), rounds: int = 5) -> Dict:
+    """
+    Compare the tiled engine with the reference adaptiveThreshold pass.
+
+    Frames are synthetic: smooth lighting gradients with hard-edged shadows
+    and sensor noise.
+
+    Returns:
+        Per-size timings (ms), speedup and absolute difference in sun exposure
+    """
+    import time
+
+    rng = np.random.default_rng(0)
+    report = {}
+    for height, width in sizes:
+        yy, xx = np.mgrid[0:height, 0:width]
+        frame = 80 + 100 * (xx / width) + 40 * np.sin(yy / 37.0)
+        frame[(xx // 300 + yy // 200) % 3 == 0] -= 60  # shadows
+        frame += rng.normal(0, 8, frame.shape)
+        gray = np.clip(frame, 0, 255).astype(np.uint8)
+
+        timings = {}
+        for name, fn in (("reference", _reference_sun_exposure),
+                         ("tiled", lambda g: sun_exposure_from_gray(g)[0])):
+            fn(gray)  # warm up
+            start = time.perf_counter()
+            for _ in range(rounds):
+                value = fn(gray)
+            timings[name] = ((time.perf_counter() - start) / rounds * 1000, value)
+
+        report[f"{width}x{height}"] = {
+            "reference_ms": round(timings["reference"][0], 2),
+            "tiled_ms": round(timings["tiled"][0], 2),
+            "speedup": round(timings["reference"][0] / timings["tiled"][0], 2),
+            "abs_diff": round(abs(timings["reference"][1] - timings["tiled"][1]), 4),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    print("[v0] Tiled sun exposure benchmark (vs GaussianBlur + adaptiveThreshold)")
+    for size, stats in benchmark().items():
+        print(f"[v0] {size:>10s}: reference {stats['reference_ms']:8.2f}ms  "
+              f"tiled {stats['tiled_ms']:8.2f}ms  speedup {stats['speedup']:.2f}x  "
+              f"diff {stats['abs_diff']:.4f}")
@@ -3,14 +3,22 @@ Phase 3: WebSocket Server (FastAPI)
 This script sets up a FastAPI WebSocket endpoint that pushes analysis results in real-time.
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import json
-from datetime import datetime
-from typing import List
+import os
+from datetime import datetime, timezone
+from typing import Dict, List
 import random
 
+from snapshot_service import SnapshotService, load_latest_results_file
+from wire_format import CameraRegistry, encode_updates
+
+# Load testing: broadcast a synthetic city instead of 10 random cameras
+SYNTHETIC_CAMERAS = int(os.environ.get("SYNTHETIC_CAMERAS", "0"))
+UPDATE_INTERVAL = float(os.environ.get("UPDATE_INTERVAL", "3"))
+
 app = FastAPI()
 
 # Enable CORS for Next.js frontend
@@ -25,33 +33,63 @@ app.add_middleware(
 # Store active WebSocket connections
 active_connections: List[WebSocket] = []
 
+# Connections that negotiated the binary wire format (?format=binary), mapped
+# to the camera registry version they last received
+binary_connections: Dict[WebSocket, int] = {}
+camera_registry = CameraRegistry()
+
+# Latest conditions, served from memory with stale-while-revalidate
+latest_snapshot = SnapshotService(load_latest_results_file)
+
 async def broadcast_analysis_results():
     """
     Continuously broadcast analysis results to all connected clients.
     In production, this would read from the CV analysis pipeline.
     """
+    city = None
+    if SYNTHETIC_CAMERAS:
+        from synthetic_city import SyntheticCity
+        city = SyntheticCity(num_cameras=SYNTHETIC_CAMERAS)
+    
     while True:
         if active_connections:
             # Simulate analysis results for all webcams
-            updates = []
-            for i in range(1, 11):
-                updates.append({
-                    "webcamId": f"cam-{i}",
-                    "sunExposure": round(random.uniform(0.3, 0.95), 3),
-                    "wetness": round(random.uniform(0.0, 0.35), 3),
-                    "timestamp": datetime.now().isoformat()
-                })
+            if city is not None:
+                city.step(UPDATE_INTERVAL)
+                updates = city.websocket_updates()
+            else:
+                updates = []
+                for i in range(1, 11):
+                    updates.append({
+                        "webcamId": f"cam-{i}",
+                        "sunExposure": round(random.uniform(0.3, 0.95), 3),
+                        "wetness": round(random.uniform(0.0, 0.35), 3),
+                        "timestamp": datetime.now(timezone.utc).isoformat()
+                    })
             
             message = {
                 "type": "analysis_update",
                 "data": updates
             }
             
+            # Encoded on first use, so clients that negotiate binary while
+            # this loop is awaiting still get a frame
+            binary_frame = None
+            
             # Broadcast to all connected clients
             disconnected = []
-            for connection in active_connections:
+            for connection in list(active_connections):
                 try:
-                    await connection.send_json(message)
+                    if connection in binary_connections:
+                        if binary_frame is None:
+                            binary_frame = encode_updates(updates, camera_registry)
+                        # Resend the camera registry whenever new cameras appear
+                        if binary_connections[connection] != camera_registry.version:
+                            await connection.send_bytes(camera_registry.encode())
+                            binary_connections[connection] = camera_registry.version
+                        await connection.send_bytes(binary_frame)
+                    else:
+                        await connection.send_json(message)
                     print(f"[v0] Sent update to client: {len(updates)} webcams")
                 except Exception as e:
                     print(f"[v0] Error sending to client: {e}")
@@ -59,25 +97,35 @@ async def broadcast_analysis_results():
             
             # Remove disconnected clients
             for conn in disconnected:
-                active_connections.remove(conn)
+                if conn in active_connections:
+                    active_connections.remove(conn)
+                binary_connections.pop(conn, None)
         
-        # Wait 3 seconds before next update
-        await asyncio.sleep(3)
+        # Wait before next update (3 seconds by default)
+        await asyncio.sleep(UPDATE_INTERVAL)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time climate data updates.
+    
+    Clients connecting with ?format=binary receive analysis updates as
+    compact binary frames (see wire_format.py) instead of JSON; decoded
+    with wire_format.decode_websocket_updates they carry the same records.
     """
     await websocket.accept()
     active_connections.append(websocket)
+    wire_format = websocket.query_params.get("format", "json")
+    if wire_format == "binary":
+        binary_connections[websocket] = -1
     
     print(f"[v0] Client connected. Total connections: {len(active_connections)}")
     
     # Send initial connection message
     await websocket.send_json({
         "type": "connected",
-        "message": "WebSocket connection established"
+        "message": "WebSocket connection established",
+        "format": "binary" if websocket in binary_connections else "json"
     })
     
     try:
@@ -93,6 +141,7 @@ async def websocket_endpoint(websocket: WebSocket):
             })
     except WebSocketDisconnect:
         active_connections.remove(websocket)
+        binary_connections.pop(websocket, None)
         print(f"[v0] Client disconnected. Total connections: {len(active_connections)}")
 
 @app.on_event("startup")
@@ -111,6 +160,15 @@ async def root():
         "status": "running"
     }
 
+@app.get("/api/latest")
+def latest_conditions(request: Request):
+    """
+    Latest city conditions. Supports If-None-Match (304 Not Modified).
+    """
+    status, headers, body = latest_snapshot.respond(request.headers.get("if-none-match"))
+    return Response(content=body, status_code=status, headers=headers,
+                    media_type=None if status == 304 else "application/json")
+
 if __name__ == "__main__":
     import uvicorn
     print("[v0] Starting FastAPI WebSocket server on port 8000")
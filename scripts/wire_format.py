@@ -0,0 +1,436 @@
+"""
+Compact Binary Wire Format
+Schema-versioned binary encoding for analysis updates. Floats are quantized
+to 16 bits and camera ids/names/locations are interned into a registry that
+is sent once instead of being repeated in every update.
+"""
+
+import json
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+SCHEMA_VERSION = 1
+MAGIC = b"UC"
+
+FRAME_REGISTRY = 1
+FRAME_UPDATE = 2
+
+COMFORT_LEVELS = ("comfortable", "moderate", "low")
+_NO_COMFORT = 3
+_NO_BRIGHTNESS = 0xFFFF
+
+# magic, schema version, frame type, record count, base timestamp (epoch seconds)
+_HEADER = struct.Struct("<2sBBId")
+# camera index, sun, wetness, brightness x10, timestamp offset (ms), flags
+_UPDATE_RECORD = struct.Struct("<IHHHiB")
+# magic, schema version, packed-field mask, sun, wetness, brightness x10,
+# timestamp (epoch seconds), flags; followed by the remaining fields as JSON
+_SINGLE_RECORD = struct.Struct("<2sBBHHHdB")
+RECORD_MAGIC = b"UR"
+# camera index, lat, lng, id length, name length
+_REGISTRY_ENTRY = struct.Struct("<IddHH")
+
+
+class WireFormatError(ValueError):
+    """Raised when a frame cannot be decoded."""
+
+
+def _quantize(value: float) -> int:
+    return int(round(max(0.0, min(1.0, value)) * 65535))
+
+
+def _dequantize(value: int) -> float:
+    return round(value / 65535, 4)
+
+
+def _to_epoch(timestamp) -> float:
+    if timestamp is None:
+        return datetime.now(timezone.utc).timestamp()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def _from_epoch(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _fields(result: Dict) -> Dict:
+    """Pull the encoded fields out of a demo, production or websocket result."""
+    analysis = result.get("analysis")
+    if analysis is not None:
+        return {
+            "sun_exposure": analysis.get("sun_exposure", 0.0),
+            "wetness": analysis.get("wetness_confidence", 0.0),
+            "brightness_avg": analysis.get("brightness_avg"),
+            "wetness_detected": analysis.get("wetness_detected", False),
+            "comfort_level": analysis.get("comfort_level"),
+        }
+    return {
+        "sun_exposure": result.get("sun_exposure", result.get("sunExposure", 0.0)),
+        "wetness": result.get("wetness", 0.0),
+        "brightness_avg": result.get("brightness_avg"),
+        "wetness_detected": result.get("wetness_detected", False),
+        "comfort_level": result.get("comfort_level"),
+    }
+
+
+def _pack_fields(fields: Dict):
+    brightness = fields["brightness_avg"]
+    brightness = _NO_BRIGHTNESS if brightness is None else min(int(round(brightness * 10)), _NO_BRIGHTNESS - 1)
+    comfort = fields["comfort_level"]
+    comfort = COMFORT_LEVELS.index(comfort) if comfort in COMFORT_LEVELS else _NO_COMFORT
+    flags = (1 if fields["wetness_detected"] else 0) | (comfort << 1)
+    return _quantize(fields["sun_exposure"]), _quantize(fields["wetness"]), brightness, flags
+
+
+def _unpack_fields(sun: int, wetness: int, brightness: int, flags: int) -> Dict:
+    comfort = (flags >> 1) & 0x3
+    return {
+        "sun_exposure": _dequantize(sun),
+        "wetness": _dequantize(wetness),
+        "brightness_avg": None if brightness == _NO_BRIGHTNESS else brightness / 10,
+        "wetness_detected": bool(flags & 1),
+        "comfort_level": COMFORT_LEVELS[comfort] if comfort != _NO_COMFORT else None,
+    }
+
+
+class CameraRegistry:
+    """
+    Interns camera ids to small integer indices.
+
+    Names and locations are stored here once and sent to clients in a
+    registry frame; `version` changes whenever a camera is added so senders
+    know when a client needs a fresh registry.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.meta: Dict[str, Dict] = {}
+        self.version = 0
+
+    def intern(self, result: Dict) -> int:
+        webcam_id = result.get("webcam_id", result.get("webcamId"))
+        idx = self.index.get(webcam_id)
+        if idx is None:
+            idx = self.index[webcam_id] = len(self.ids)
+            self.ids.append(webcam_id)
+            location = result.get("location") or {}
+            self.meta[webcam_id] = {
+                "name": result.get("webcam_name", webcam_id),
+                "lat": location.get("lat", 0.0),
+                "lng": location.get("lng", 0.0),
+            }
+            self.version += 1
+        return idx
+
+    def encode(self) -> bytes:
+        """Encode the full registry as a registry frame."""
+        parts = [_HEADER.pack(MAGIC, SCHEMA_VERSION, FRAME_REGISTRY, len(self.ids), 0.0)]
+        for idx, webcam_id in enumerate(self.ids):
+            meta = self.meta[webcam_id]
+            id_bytes = webcam_id.encode("utf-8")
+            name_bytes = meta["name"].encode("utf-8")
+            parts.append(_REGISTRY_ENTRY.pack(idx, meta["lat"], meta["lng"], len(id_bytes), len(name_bytes)))
+            parts.append(id_bytes)
+            parts.append(name_bytes)
+        return b"".join(parts)
+
+    def load(self, frame: bytes):
+        """Replace the registry contents from a registry frame."""
+        _, _, _, count, _ = _read_header(frame, FRAME_REGISTRY)
+        offset = _HEADER.size
+        self.__init__()
+        for _ in range(count):
+            idx, lat, lng, id_len, name_len = _REGISTRY_ENTRY.unpack_from(frame, offset)
+            offset += _REGISTRY_ENTRY.size
+            webcam_id = frame[offset:offset + id_len].decode("utf-8")
+            offset += id_len
+            name = frame[offset:offset + name_len].decode("utf-8")
+            offset += name_len
+            if idx != len(self.ids):
+                raise WireFormatError(f"Registry index {idx} out of order")
+            self.index[webcam_id] = idx
+            self.ids.append(webcam_id)
+            self.meta[webcam_id] = {"name": name, "lat": lat, "lng": lng}
+        self.version += 1
+
+
+def _read_header(frame: bytes, expected_type: Optional[int] = None):
+    if len(frame) < _HEADER.size:
+        raise WireFormatError("Frame too short")
+    magic, version, frame_type, count, base = _HEADER.unpack_from(frame, 0)
+    if magic != MAGIC:
+        raise WireFormatError("Bad magic")
+    if version != SCHEMA_VERSION:
+        raise WireFormatError(f"Unsupported schema version {version}")
+    if expected_type is not None and frame_type != expected_type:
+        raise WireFormatError(f"Expected frame type {expected_type}, got {frame_type}")
+    return magic, version, frame_type, count, base
+
+
+def encode_updates(results: List[Dict], registry: CameraRegistry, timestamp=None) -> bytes:
+    """
+    Encode a batch of analysis results as an update frame.
+
+    Args:
+        results: Pipeline or websocket result dictionaries
+        registry: Registry used to intern camera ids (new cameras are added)
+        timestamp: Base timestamp for the frame (defaults to the first
+            result's timestamp, or now)
+
+    Returns:
+        Encoded frame bytes
+    """
+    if timestamp is None and results:
+        timestamp = results[0].get("timestamp")
+    base = _to_epoch(timestamp)
+    # Results in a batch usually share a handful of timestamps
+    epochs: Dict = {}
+    buf = bytearray(_HEADER.size + _UPDATE_RECORD.size * len(results))
+    _HEADER.pack_into(buf, 0, MAGIC, SCHEMA_VERSION, FRAME_UPDATE, len(results), base)
+    offset = _HEADER.size
+    for result in results:
+        idx = registry.intern(result)
+        sun, wetness, brightness, flags = _pack_fields(_fields(result))
+        ts = result.get("timestamp", base)
+        epoch = epochs.get(ts)
+        if epoch is None:
+            epoch = epochs[ts] = _to_epoch(ts)
+        delta_ms = int(round((epoch - base) * 1000))
+        if not -2**31 <= delta_ms < 2**31:
+            raise WireFormatError(f"Timestamp {ts} too far from frame base")
+        _UPDATE_RECORD.pack_into(buf, offset, idx, sun, wetness, brightness, delta_ms, flags)
+        offset += _UPDATE_RECORD.size
+    return bytes(buf)
+
+
+def decode_updates(frame: bytes, registry: CameraRegistry) -> List[Dict]:
+    """
+    Decode an update frame back into flat result dictionaries.
+
+    Args:
+        frame: Encoded update frame
+        registry: Registry the frame was encoded against
+
+    Returns:
+        List of result dictionaries
+    """
+    _, _, _, count, base = _read_header(frame, FRAME_UPDATE)
+    if len(frame) < _HEADER.size + count * _UPDATE_RECORD.size:
+        raise WireFormatError("Truncated update frame")
+    results = []
+    timestamps: Dict[int, str] = {}
+    for idx, sun, wetness, brightness, delta_ms, flags in _UPDATE_RECORD.iter_unpack(
+        frame[_HEADER.size:_HEADER.size + count * _UPDATE_RECORD.size]
+    ):
+        if idx >= len(registry.ids):
+            raise WireFormatError(f"Unknown camera index {idx}")
+        webcam_id = registry.ids[idx]
+        meta = registry.meta[webcam_id]
+        result = {
+            "webcam_id": webcam_id,
+            "webcam_name": meta["name"],
+            "location": {"lat": meta["lat"], "lng": meta["lng"]},
+            "timestamp": timestamps.get(delta_ms) or timestamps.setdefault(
+                delta_ms, _from_epoch(base + delta_ms / 1000)
+            ),
+        }
+        result.update(_unpack_fields(sun, wetness, brightness, flags))
+        results.append(result)
+    return results
+
+
+def to_websocket_update(result: Dict) -> Dict:
+    """
+    The analysis_update record the websocket's JSON format sends for a
+    result, so JSON and binary clients see the same payload.
+    """
+    fields = _fields(result)
+    return {
+        "webcamId": result.get("webcam_id", result.get("webcamId")),
+        "sunExposure": fields["sun_exposure"],
+        "wetness": fields["wetness"],
+        "timestamp": result.get("timestamp"),
+    }
+
+
+def decode_websocket_updates(frame: bytes, registry: CameraRegistry) -> List[Dict]:
+    """Decode an update frame into websocket analysis_update records."""
+    return [to_websocket_update(result) for result in decode_updates(frame, registry)]
+
+
+# RecordCodec packed-field mask bits
+_PACK_SUN = 1
+_PACK_WETNESS = 2
+_PACK_BRIGHTNESS = 4
+_PACK_WET = 8
+_PACK_COMFORT = 16
+_PACK_TIMESTAMP = 32
+_PACK_NESTED = 64  # fields live in data["analysis"] (demo/synthetic shape)
+
+
+class RecordCodec:
+    """
+    Encodes a single camera's analysis data for key-per-camera stores
+    such as the Redis cache, where the camera id is already in the key.
+
+    Fields the binary record can hold exactly (quantized values that
+    round-trip, booleans, comfort levels, UTC ISO timestamps) are packed;
+    everything else - names, locations, paths, versions, extra scores -
+    travels as a compact JSON tail, so decode(encode(d)) == d for both the
+    nested demo shape and the flat production shape. Values without the
+    record magic (e.g. plain JSON written by another writer) decode as JSON.
+    """
+
+    content_type = "application/x-urban-climate-record"
+
+    def encode(self, data: Dict) -> bytes:
+        rest = dict(data)
+        mask = 0
+        container = rest
+        wetness_key = "wetness"
+        if isinstance(rest.get("analysis"), dict):
+            container = rest["analysis"] = dict(rest["analysis"])
+            wetness_key = "wetness_confidence"
+            mask |= _PACK_NESTED
+
+        def take(key, bit, fits):
+            nonlocal mask
+            value = container.get(key)
+            if key in container and fits(value):
+                del container[key]
+                mask |= bit
+                return value
+            return None
+
+        def quantizable(value):
+            return isinstance(value, float) and _dequantize(_quantize(value)) == value
+
+        def tenths(value):
+            return isinstance(value, float) and 0 <= value < _NO_BRIGHTNESS / 10 and round(value * 10) / 10 == value
+
+        sun = take("sun_exposure", _PACK_SUN, quantizable)
+        wetness = take(wetness_key, _PACK_WETNESS, quantizable)
+        brightness = take("brightness_avg", _PACK_BRIGHTNESS, tenths)
+        wet = take("wetness_detected", _PACK_WET, lambda v: isinstance(v, bool))
+        comfort = take("comfort_level", _PACK_COMFORT, lambda v: v in COMFORT_LEVELS)
+
+        epoch = 0.0
+        timestamp = rest.get("timestamp")
+        if isinstance(timestamp, str):
+            try:
+                epoch = _to_epoch(timestamp)
+                if _from_epoch(epoch) == timestamp:
+                    del rest["timestamp"]
+                    mask |= _PACK_TIMESTAMP
+            except ValueError:
+                pass
+
+        flags = (1 if wet else 0) | ((COMFORT_LEVELS.index(comfort) if comfort else _NO_COMFORT) << 1)
+        header = _SINGLE_RECORD.pack(
+            RECORD_MAGIC, SCHEMA_VERSION, mask,
+            _quantize(sun or 0.0), _quantize(wetness or 0.0),
+            int(round(brightness * 10)) if brightness is not None else _NO_BRIGHTNESS,
+            epoch, flags,
+        )
+        return header + json.dumps(rest, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, value: bytes) -> Dict:
+        if not value.startswith(RECORD_MAGIC):
+            return json.loads(value)
+        if len(value) < _SINGLE_RECORD.size:
+            raise WireFormatError("Bad record length")
+        _, version, mask, sun, wetness, brightness, epoch, flags = _SINGLE_RECORD.unpack_from(value)
+        if version != SCHEMA_VERSION:
+            raise WireFormatError(f"Unsupported schema version {version}")
+        data = json.loads(value[_SINGLE_RECORD.size:])
+        container = data.setdefault("analysis", {}) if mask & _PACK_NESTED else data
+        fields = _unpack_fields(sun, wetness, brightness, flags)
+        if mask & _PACK_SUN:
+            container["sun_exposure"] = fields["sun_exposure"]
+        if mask & _PACK_WETNESS:
+            container["wetness_confidence" if mask & _PACK_NESTED else "wetness"] = fields["wetness"]
+        if mask & _PACK_BRIGHTNESS:
+            container["brightness_avg"] = fields["brightness_avg"]
+        if mask & _PACK_WET:
+            container["wetness_detected"] = fields["wetness_detected"]
+        if mask & _PACK_COMFORT:
+            container["comfort_level"] = fields["comfort_level"]
+        if mask & _PACK_TIMESTAMP:
+            data["timestamp"] = _from_epoch(epoch)
+        return data
+
+
+def benchmark(num_updates: int = 1000, rounds: int = 20) -> Dict[str, Dict]:
+    """
+    Compare encode/decode speed and size of the binary format with JSON.
+
+    Args:
+        num_updates: Results per batch
+        rounds: Timed repetitions per format
+
+    Returns:
+        Dictionary of per-format timings (microseconds per update) and bytes per update
+    """
+    import random
+    import time
+
+    now = datetime.now(timezone.utc).isoformat()
+    results = []
+    for i in range(num_updates):
+        sun = random.random()
+        results.append({
+            "webcam_id": f"cam-{i}",
+            "webcam_name": f"Camera {i}",
+            "location": {"lat": 40.7 + random.random() * 0.1, "lng": -74.0 + random.random() * 0.1},
+            "analysis": {
+                "sun_exposure": round(sun, 3),
+                "shadow_ratio": round(1 - sun, 3),
+                "brightness_avg": round(sun * 200 + 55, 1),
+                "wetness_detected": random.random() < 0.2,
+                "wetness_confidence": round(random.random(), 2),
+                "comfort_level": "comfortable" if sun > 0.7 else "moderate" if sun > 0.4 else "low",
+            },
+            "timestamp": now,
+            "status": "success",
+        })
+
+    registry = CameraRegistry()
+    # Registry is sent once per client, so it is reported separately
+    encode_updates(results, registry, now)
+    registry_frame_size = len(registry.encode())
+
+    formats = {
+        "json_indent": (lambda: json.dumps(results, indent=2).encode(), lambda b: json.loads(b)),
+        "json": (lambda: json.dumps(results).encode(), lambda b: json.loads(b)),
+        "binary": (lambda: encode_updates(results, registry, now), lambda b: decode_updates(b, registry)),
+    }
+
+    report = {}
+    for name, (encode, decode) in formats.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            payload = encode()
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(rounds):
+            decode(payload)
+        decode_time = time.perf_counter() - start
+        report[name] = {
+            "encode_us_per_update": round(encode_time / rounds / num_updates * 1e6, 3),
+            "decode_us_per_update": round(decode_time / rounds / num_updates * 1e6, 3),
+            "bytes_per_update": round(len(payload) / num_updates, 1),
+        }
+    report["binary"]["registry_bytes_per_camera"] = round(registry_frame_size / num_updates, 1)
+    return report
+
+
+if __name__ == "__main__":
+    print("[v0] Wire format benchmark (binary vs JSON)")
+    for name, stats in benchmark().items():
+        print(f"[v0] {name:12s} encode {stats['encode_us_per_update']:7.2f}us  "
+              f"decode {stats['decode_us_per_update']:7.2f}us  "
+              f"{stats['bytes_per_update']:7.1f} bytes/update")